@@ -1,91 +1,229 @@
-import re
-import numpy as np
+import os
+import json
+import argparse
 import pandas as pd
-import kagglehub
-import string
-import contractions
-from nltk.corpus import stopwords
-
-# Download dataset from Kaggle (https://www.kaggle.com/datasets/gpreda/wallstreetbets-2022)
-path = kagglehub.dataset_download("gpreda/wallstreetbets-2022")
-data = pd.read_csv(f"{path}/wallstreetbets_2022.csv", encoding="utf-8", dtype={"body": str}, low_memory=False)
-
-# Extracts the date of the post from the Kaggle dataset.
-if "timestamp" in data.columns:
-    data["date"] = pd.to_datetime(data["timestamp"]).dt.date  # Keeps only YYYY-MM-DD and not the time as well.
-
-# Loads the symbols from the symbol.csv
-symbolsCSV = pd.read_csv("symbols.csv", encoding="utf-8", usecols=["Symbol"])
-validSymbols = set(symbolsCSV["Symbol"].astype(str).str.upper())
-
-# Keeps only the required columns in the dataset.
-data = data[["date", "body"]].dropna(subset=["body"])
-
-# Filters unated posts that are very common occurences on the r/WallStreetBets subreddit.
-data.replace(to_replace='None', value=np.nan).dropna()
-data = data[~data["body"].str.contains("Your daily trading discussion thread.")]
-data = data[~data["body"].str.contains("Your daily hype thread.")]
-data = data[~data["body"].str.contains("Your weekend discussion thread.")]
-data = data[~data["body"].str.contains("Welcome to WSB")]
-data = data[~data["body"].str.contains(r"Inductions\n")]
-data = data[~data["body"].str.contains("This is an old Yacht Club thread")]
-data = data[~data["body"].str.contains(r"\*Processing img")]
-data = data[~data["body"].str.contains("You already have a bet")]
-data = data[data["body"].str.contains(" ")]
-
-# Sets our variables and compiles our regex.
-urlRegex = re.compile(r"https?://\S+") 
-symbolRegex = re.compile(r'(?<!\w)\b[A-Z]{2,5}\b(?!\w)')
-imgemoteRegex = re.compile(r"imgemotet\w*\d*")
-
-# Creates our stopwords library.
-stopWords = set(stopwords.words("english"))
-
-# Function the removes all non ASCII charcters (used to remove emojis)
-def removeNonASCII(text):
-    return ''.join(char for char in text if ord(char) < 128)
-
-# Function to complete preprocessing on the text.
-def preProcessText(s):
-    s = s.lower() # Make post lowercase
-    s = contractions.fix(s) # Fix contractions within the post
-    s = urlRegex.sub("", s) # Remove url's from the posts
-    s = removeNonASCII(s) # Remove all non ASCII chracters from posts (emojis)
-    s = "".join(char for char in s 
-                if char not in string.punctuation)  # Remove punctuation from the posts
-    s = " ".join(word for word in s.split() 
-                if word not in stopWords) # Removes stop words
-    s = imgemoteRegex.sub("", s) 
-    
-    return s # Returns the processed post.
-
-# Function that checks if a post is made up of more then 25% numbers.
-def checkNumbers(post):
-    words = post.split()
-    num_count = sum(word.isdigit() for word in words)
-    return (num_count / len(words)) > 0.25 
+from tickerIndex import extractTickers, extractTickersBatch
+from lazyResources import get_ticker_index
+from processedPosts import PROCESSED_FILES, columns, openWriter, outputColumns, outputPosition
+from nearDuplicates import NearDuplicateIndex
+from postFilters import filterPosts
 
-# Function to extract stock symbols from posts.
-def extractSymbols(post):
-    if not isinstance(post, str):
-        return []
-    return list(set(symbol for symbol in symbolRegex.findall(post.upper()) if symbol in validSymbols))
-
-# Applys text preprocessing on each post.
-data["post"] = data["body"].astype(str).apply(preProcessText)
-data = data[data["post"].str.split().str.len() > 1] # Checks if the post has 2 or more words.
-
-# Extracts stock symbols from posts.
-data["symbols"] = data["post"].apply(extractSymbols)
-
-# Keeps posts that mention at least one valid ticker (removes the other ones)
-data = data[data["symbols"].str.len() > 0]
-data = data[~data["post"].apply(checkNumbers)] # Calls the check numbers function.
-
-# Creates columns for our processed csv.
-columns = ["date", "body", "post", "symbols"]  # Added 'body' to keep the original post
-data[columns].to_csv("processedWSBposts.csv", index=False, encoding="utf-8-sig") # Save to csv
-
-print(f"Data saved to processedWSBposts.csv with original posts included")
+WATERMARK_FILE = "processedWSBposts.watermark.json"
+maxEpochSeconds = 1e11  # Numeric timestamps past this (the year 5138) aren't seconds since the epoch
 
+# Loads the ticker index built from symbols.csv (see tickerIndex.py) the first time it is needed.
+def getTickerIndex():
+    return get_ticker_index("symbols.csv", "Symbol", "symbols.idx")
 
+# Function to extract stock symbols from posts.
+def extractSymbols(post):
+    return extractTickers(getTickerIndex(), post)
+
+# Parses one timestamp the vectorized parse couldn't, as a naive UTC time (NaT if it isn't a timestamp at all).
+def parseTimestamp(value):
+    try:
+        timestamp = pd.Timestamp(value)
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    if timestamp is not pd.NaT and timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp
+
+# Parses post timestamps, given as date-time strings or as numbers of seconds since the Unix epoch.
+# Timestamps that can't be parsed become NaT instead of failing the whole chunk.
+def parseTimestamps(timestamps):
+    numbers = pd.to_numeric(timestamps, errors="coerce")
+    isNumber = numbers.notna() & (numbers.abs() < maxEpochSeconds)
+    parsed = pd.to_datetime(timestamps.where(numbers.isna()), errors="coerce")
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_convert("UTC").dt.tz_localize(None)
+    parsed = parsed.astype("datetime64[us]")
+    # Strings in another format than the first one pandas saw are parsed one by one.
+    retry = parsed.isna() & timestamps.notna() & numbers.isna()
+    if retry.any():
+        parsed[retry] = [parseTimestamp(value) for value in timestamps[retry]]
+    if isNumber.any():
+        parsed[isNumber] = pd.to_datetime(numbers[isNumber], unit="s").astype("datetime64[us]")
+    return parsed
+
+# Runs every filter and transform stage on a DataFrame (the whole dataset or a single chunk of it).
+# Every stage only looks at its own row, so chunks give the same rows as processing everything at once.
+# With a NearDuplicateIndex, near-duplicate posts are clustered across all chunks given to it and every post records
+# its cluster's representative (so it gets the same sentiment), unless dropDuplicates is set, which only keeps the
+# first post of each cluster.
+# With a rejections dict, the number of posts removed by each filter is added to it.
+def processChunk(data, dedup=None, dropDuplicates=False, rejections=None):
+    # Extracts the date of the post from the Kaggle dataset, removing posts whose timestamp can't be parsed.
+    if "timestamp" in data.columns:
+        timestamps = parseTimestamps(data["timestamp"])
+        if rejections is not None:
+            rejections["badTimestamp"] = rejections.get("badTimestamp", 0) + int(timestamps.isna().sum())
+        data = data[timestamps.notna()].copy()
+        data["date"] = timestamps[timestamps.notna()].dt.date  # Keeps only YYYY-MM-DD and not the time as well.
+
+    # Keeps only the required columns in the dataset, with the post id as a string (empty if the dataset has none).
+    data = data.reindex(columns=["id", "date", "body"])
+    data["id"] = [str(postId) if pd.notna(postId) else None for postId in data["id"]]
+
+    # Removes missing and unrated posts that are very common occurences on the r/WallStreetBets subreddit,
+    # applies text preprocessing, and removes posts under 2 words or over 25% numbers, all in one pass (see postFilters.py).
+    keep, posts, rejected = filterPosts(data["body"])
+    data = data[keep].assign(post=posts)
+    if rejections is not None:
+        for rule, count in rejected.items():
+            rejections[rule] = rejections.get(rule, 0) + count
+    if data.empty:
+        return data.reindex(columns=columns)
+
+    # Extracts stock symbols from all posts in a single scan.
+    data["symbols"] = pd.Series(extractTickersBatch(getTickerIndex(), data["post"]), index=data.index)
+
+    # Keeps posts that mention at least one valid ticker (removes the other ones)
+    hasSymbols = data["symbols"].str.len() > 0
+    if rejections is not None:
+        rejections["noTicker"] = rejections.get("noTicker", 0) + int((~hasSymbols).sum())
+    data = data[hasSymbols]
+    if data.empty:
+        return data.reindex(columns=columns)
+
+    data["representative"] = None
+    if dedup is not None and not data.empty:
+        representatives, isFirst = dedup.assign(data["post"])
+        if dropDuplicates:
+            data = data[isFirst]
+        else:
+            data["representative"] = representatives.where(representatives != data["post"])
+
+    return data[columns]
+
+# Reads the whole dataset into memory and processes it in one go.
+def processAll(inputFile, outputFile, dedup=None, dropDuplicates=False, rejections=None):
+    data = pd.read_csv(inputFile, encoding="utf-8", dtype={"id": str, "body": str}, low_memory=False)
+    data = processChunk(data, dedup, dropDuplicates, rejections)
+    with openWriter(outputFile) as writer: # Save as Parquet or csv
+        writer.write(data)
+    return len(data)
+
+# Streams the dataset in chunks, appending each processed chunk to the output as it goes.
+# Peak memory depends on the chunk size instead of the size of the dataset.
+def processStreaming(inputFile, outputFile, chunkSize, dedup=None, dropDuplicates=False, rejections=None):
+    rowsWritten = 0
+    reader = pd.read_csv(inputFile, encoding="utf-8", dtype={"id": str, "body": str}, chunksize=chunkSize)
+    # The output is opened once so the csv header is only written at the start.
+    with openWriter(outputFile) as writer:
+        for chunk in reader:
+            chunk = processChunk(chunk, dedup, dropDuplicates, rejections)
+            writer.write(chunk)
+            rowsWritten += len(chunk)
+    return rowsWritten
+
+# Loads the watermark saved by the last incremental run, or None if there isn't a usable one.
+def loadWatermark(watermarkFile, outputFile):
+    if not os.path.exists(watermarkFile) or not os.path.exists(outputFile):
+        return None
+    with open(watermarkFile, "r", encoding="utf-8") as f:
+        watermark = json.load(f)
+    # A shorter output than recorded means it was replaced or edited, so it can't be appended to safely.
+    # Neither can an output written with different columns, so it is rebuilt in full.
+    if outputColumns(outputFile) != columns:
+        return None
+    position = outputPosition(outputFile)
+    if watermark.get("output") != os.path.abspath(outputFile) or watermark.get("position", {}).keys() != position.keys():
+        return None
+    if any(position[key] < value for key, value in watermark["position"].items()):
+        return None
+    return watermark
+
+# Writes the watermark to a temporary file first so an interruption never leaves a half written one.
+def saveWatermark(watermarkFile, watermark):
+    tempFile = f"{watermarkFile}.tmp"
+    with open(tempFile, "w", encoding="utf-8") as f:
+        json.dump(watermark, f)
+    os.replace(tempFile, watermarkFile)
+
+# Marks the rows of a raw chunk that come after the watermark, ordered by (timestamp, post id).
+def rowsAfter(chunk, timestamps, watermark):
+    if watermark is None:
+        return pd.Series(True, index=chunk.index)
+    lastTimestamp = pd.Timestamp(watermark["timestamp"])
+    return (timestamps > lastTimestamp) | ((timestamps == lastTimestamp) & (chunk["id"] > watermark["id"]))
+
+# Only processes the rows posted after the last incremental run and appends them to the output.
+# The watermark records the newest (timestamp, post id) seen along with where the output ended once its
+# rows were written (bytes for csv, parts and rows for Parquet). Each run only writes its new rows: they are
+# appended to the csv, or added as a new Parquet part. A run that is interrupted before saving its watermark
+# is undone by cutting the output back to that point (dropping the parts written after it), so re-running it
+# gives the same output as an uninterrupted run.
+# Posts that show up in a later dump with a timestamp before the watermark are not picked up, and near-duplicates
+# are only clustered within the new posts.
+def processIncremental(inputFile, outputFile, watermarkFile, chunkSize, dedup=None, dropDuplicates=False, rejections=None):
+    watermark = loadWatermark(watermarkFile, outputFile)
+    rowsWritten = 0
+    newest = None
+    reader = pd.read_csv(inputFile, encoding="utf-8", dtype={"id": str, "body": str},
+                         chunksize=chunkSize if chunkSize > 0 else None, low_memory=False)
+    chunks = reader if chunkSize > 0 else [reader]
+
+    # Without a watermark this is a full run that rebuilds the output from scratch.
+    with openWriter(outputFile, watermark["position"] if watermark else None) as writer:
+        for chunk in chunks:
+            timestamps = parseTimestamps(chunk["timestamp"])
+            isNew = rowsAfter(chunk, timestamps, watermark)
+            if not isNew.any():
+                continue
+
+            # The watermark covers every new row read, including the ones the filters remove
+            # (rows whose timestamp can't be parsed have no place in that order and are left out).
+            hasTimestamp = isNew & timestamps.notna()
+            if hasTimestamp.any():
+                keys = pd.DataFrame({"timestamp": timestamps[hasTimestamp], "id": chunk.loc[hasTimestamp, "id"]})
+                latest = keys.sort_values(["timestamp", "id"]).iloc[-1]
+                if newest is None or (latest["timestamp"], latest["id"]) > newest:
+                    newest = (latest["timestamp"], latest["id"])
+
+            processed = processChunk(chunk[isNew].copy(), dedup, dropDuplicates, rejections)
+            writer.write(processed)
+            rowsWritten += len(processed)
+
+    if newest is not None:
+        saveWatermark(watermarkFile, {
+            "output": os.path.abspath(outputFile),
+            "position": writer.position,
+            "timestamp": newest[0].isoformat(),
+            "id": newest[1],
+        })
+    return rowsWritten
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess the r/WallStreetBets Kaggle dataset.")
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help="Rows per chunk in streaming mode (0 reads the whole dataset at once).")
+    parser.add_argument("--format", choices=PROCESSED_FILES, default="parquet",
+                        help="Parquet keeps the date and symbols typed for the ingest scripts; csv is plain text.")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Only process posts newer than the watermark in {WATERMARK_FILE} and append them.")
+    parser.add_argument("--dedup-threshold", type=float, default=0,
+                        help="Cluster posts at least this similar (0-1, e.g. 0.8) so only one per cluster is scored and the others reuse its label (0 disables).")
+    parser.add_argument("--drop-duplicates", action="store_true",
+                        help="With --dedup-threshold, drop every post but the first of each cluster instead of keeping them with their representative.")
+    args = parser.parse_args()
+
+    # Download dataset from Kaggle (https://www.kaggle.com/datasets/gpreda/wallstreetbets-2022)
+    import kagglehub
+    path = kagglehub.dataset_download("gpreda/wallstreetbets-2022")
+    inputFile = f"{path}/wallstreetbets_2022.csv"
+    outputFile = PROCESSED_FILES[args.format]
+    dedup = NearDuplicateIndex(args.dedup_threshold) if args.dedup_threshold > 0 else None
+    rejections = {}
+
+    if args.incremental:
+        rowsWritten = processIncremental(inputFile, outputFile, WATERMARK_FILE, args.chunk_size, dedup, args.drop_duplicates, rejections)
+    elif args.chunk_size > 0:
+        rowsWritten = processStreaming(inputFile, outputFile, args.chunk_size, dedup, args.drop_duplicates, rejections)
+    else:
+        rowsWritten = processAll(inputFile, outputFile, dedup, args.drop_duplicates, rejections)
+
+    print(f"{rowsWritten} posts saved to {outputFile} with original posts included")
+    print(f"Posts removed by each filter: {rejections}")
+    if dedup is not None:
+        print(f"Near-duplicates: {dedup.stats()}")
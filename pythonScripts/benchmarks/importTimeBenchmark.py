@@ -0,0 +1,74 @@
+# Measures how long importing each pipeline module takes in a fresh interpreter, so slow imports are caught early.
+# Run from pythonScripts/:  python -m benchmarks.importTimeBenchmark [--budget 1.0] [--baseline importTimes.json]
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+MODULES = [
+    "textNormalizer", "tickerIndex", "sentimentInference", "sentimentCache", "lazyResources", "shardedInference",
+    "processedPosts", "PreProcessing", "sentimentAnalysis", "mongoInsert", "mongoInsert2", "main",
+]
+OUTPUT_FILE = "importTimes.json"
+TIMER = "import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+
+def import_seconds(module):
+    """Seconds taken by `import module` in a new interpreter, plus its slowest direct imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TIMER.format(module=module)],
+        capture_output=True, text=True, check=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    # -X importtime lines look like "import time:  self [us] | cumulative [us] | package", with the package
+    # indented two spaces per level; the module's direct imports are the ones one level deep.
+    dependencies = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name[1:].startswith("  ") and not name[1:].startswith("    "):
+            dependencies.append((int(cumulative) / 1e6, name.strip()))
+    dependencies.sort(reverse=True)
+    return float(result.stdout.strip().splitlines()[-1]), dependencies[:5]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the pipeline modules.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds an import may take before it is flagged.")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--baseline", help="Earlier results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown against the baseline.")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        runs = [import_seconds(module) for _ in range(args.repeats)]
+        seconds = statistics.median(run[0] for run in runs)
+        results[module] = {
+            "seconds": round(seconds, 4),
+            "slowestImports": {name: round(cumulative, 4) for cumulative, name in runs[-1][1]},
+        }
+        heaviest = ", ".join(f"{name} {cumulative:.2f}s" for cumulative, name in runs[-1][1][:3])
+        print(f"{module:>20} {seconds:7.3f} s   ({heaviest})")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"budgetSeconds": args.budget, "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    problems = [f"{module} takes {result['seconds']:.3f} s (budget {args.budget} s)" for module, result in results.items() if result["seconds"] > args.budget]
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        for module, result in results.items():
+            previous = baseline.get(module)
+            if previous and result["seconds"] > previous["seconds"] * (1 + args.tolerance):
+                problems.append(f"{module}: {previous['seconds']} -> {result['seconds']} s")
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
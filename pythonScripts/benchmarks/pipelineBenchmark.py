@@ -0,0 +1,178 @@
+# Benchmarks each ingest pipeline stage, and the whole pipeline end to end, on synthetic corpora of several sizes.
+# Run from pythonScripts/:  python -m benchmarks.pipelineBenchmark [--sizes 1000 10000] [--baseline benchmarkResults.json]
+# Model stages use a tiny locally built model by default (see tinyModel.py), so the suite runs offline.
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import statistics
+import torch
+import pandas as pd
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from PreProcessing import getTickerIndex, processChunk
+from textNormalizer import normalizePosts
+from tickerIndex import extractTickersBatch
+from nearDuplicates import NearDuplicateIndex
+from postFilters import filterPosts
+from sentimentInference import encode_pending_posts, analyze_encoded_batch
+from benchmarks.syntheticCorpus import generate_corpus
+from benchmarks.tinyModel import build_tiny_model
+
+STAGES = ["filterPosts", "preProcessText", "extractSymbols", "processChunk", "nearDuplicates", "filterValidPosts", "inference", "endToEnd"]
+MODEL_STAGES = {"filterValidPosts", "inference", "endToEnd"}
+OUTPUT_FILE = "benchmarkResults.json"
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def measure(function, batches, rows, repeats):
+    """Times function over every batch, repeats times, then once more under tracemalloc for the peak memory.
+
+    Latency percentiles are per batch. Throughput uses the median total time of the repeats. Peak memory
+    only counts allocations made through Python, so it does not include torch's tensor buffers.
+    """
+    batch_seconds = []
+    totals = []
+    for _ in range(repeats):
+        total = 0.0
+        for batch in batches:
+            started = time.perf_counter()
+            function(batch)
+            elapsed = time.perf_counter() - started
+            batch_seconds.append(elapsed)
+            total += elapsed
+        totals.append(total)
+
+    tracemalloc.start()
+    for batch in batches:
+        function(batch)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total = statistics.median(totals)
+    return {
+        "rows": rows,
+        "rowsPerSecond": round(rows / total, 1),
+        "totalSeconds": round(total, 4),
+        "p50BatchMs": round(percentile(batch_seconds, 0.50) * 1000, 3),
+        "p95BatchMs": round(percentile(batch_seconds, 0.95) * 1000, 3),
+        "p99BatchMs": round(percentile(batch_seconds, 0.99) * 1000, 3),
+        "peakPythonMemoryMB": round(peak / 2**20, 2),
+    }
+
+def split(sequence, size):
+    return [sequence[i:i + size] for i in range(0, len(sequence), size)]
+
+def benchmark_size(size, stages, args, tokenizer, model):
+    corpus = generate_corpus(size, args.seed)
+    bodies = corpus["body"].dropna()
+    posts = [post for post in normalizePosts(bodies) if post]
+    processed = processChunk(corpus.copy())
+    processed_posts = processed["post"].astype(str).tolist()
+
+    def filter_valid_posts(batch):
+        return encode_pending_posts(batch, tokenizer, {})
+
+    def inference(features):
+        return analyze_encoded_batch(list(features), tokenizer, model, args.max_batch_size, args.max_batch_tokens)
+
+    def end_to_end(chunk):
+        chunk = processChunk(chunk.copy())
+        pending = encode_pending_posts(chunk["post"].astype(str).tolist(), tokenizer, {})
+        return analyze_encoded_batch(list(pending.values()), tokenizer, model, args.max_batch_size, args.max_batch_tokens)
+
+    tickerIndex = getTickerIndex()
+    # Each stage gets the input it sees in the real pipeline: raw bodies, normalized posts, or processed posts.
+    runs = {
+        "filterPosts": (filterPosts, split(corpus["body"], args.batch_size), size),
+        "preProcessText": (normalizePosts, [batch for batch in split(bodies, args.batch_size)], len(bodies)),
+        "extractSymbols": (lambda batch: extractTickersBatch(tickerIndex, batch), split(posts, args.batch_size), len(posts)),
+        "processChunk": (lambda batch: processChunk(batch.copy()), split(corpus, args.batch_size), size),
+        # A new index per batch, so repeats don't just hit the clusters found by the previous one.
+        "nearDuplicates": (lambda batch: NearDuplicateIndex(args.dedup_threshold).assign(pd.Series(batch)),
+                           split(processed_posts, args.batch_size), len(processed_posts)),
+        "endToEnd": (end_to_end, split(corpus, args.batch_size), size),
+    }
+    if MODEL_STAGES & set(stages):
+        pending = encode_pending_posts(processed_posts, tokenizer, {})
+        runs["filterValidPosts"] = (filter_valid_posts, split(processed_posts, args.batch_size), len(processed_posts))
+        runs["inference"] = (inference, split(list(pending.values()), args.batch_size), len(pending))
+
+    results = {}
+    for stage in stages:
+        function, batches, rows = runs[stage]
+        results[stage] = measure(function, batches, rows, args.repeats)
+        print(f"{stage:>16} {size:>8} rows  {results[stage]['rowsPerSecond']:>11.1f} rows/s  "
+              f"p95 {results[stage]['p95BatchMs']:>9.2f} ms/batch  peak {results[stage]['peakPythonMemoryMB']:>8.2f} MB")
+    return results
+
+def compare(results, baseline, tolerance):
+    """Stage/size pairs whose throughput fell, or whose peak memory grew, by more than tolerance against the baseline."""
+    regressions = []
+    for stage, sizes in results.items():
+        for size, current in sizes.items():
+            previous = baseline.get(stage, {}).get(size)
+            if previous is None:
+                continue
+            if current["rowsPerSecond"] < previous["rowsPerSecond"] * (1 - tolerance):
+                regressions.append(f"{stage} @ {size} rows: {previous['rowsPerSecond']} -> {current['rowsPerSecond']} rows/s")
+            if current["peakPythonMemoryMB"] > previous["peakPythonMemoryMB"] * (1 + tolerance):
+                regressions.append(f"{stage} @ {size} rows: peak {previous['peakPythonMemoryMB']} -> {current['peakPythonMemoryMB']} MB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing and inference stages on synthetic WSB posts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per batch; latency percentiles are per batch.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dedup-threshold", type=float, default=0.8)
+    parser.add_argument("--model", default=None, help="Model for the model stages (default: the tiny offline model).")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-batch-tokens", type=int, default=8192)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--baseline", help="Earlier results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown or memory growth.")
+    args = parser.parse_args()
+
+    tokenizer = model = None
+    if MODEL_STAGES & set(args.stages):
+        model_name = args.model or build_tiny_model(seed=args.seed)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+
+    results = {stage: {} for stage in args.stages}
+    for size in args.sizes:
+        for stage, result in benchmark_size(size, args.stages, args, tokenizer, model).items():
+            results[stage][str(size)] = result
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "torchThreads": torch.get_num_threads(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+    main()
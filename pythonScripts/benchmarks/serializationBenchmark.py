@@ -0,0 +1,63 @@
+# Compares the old API serialization path with fastJson.dumps on synthetic ticker responses.
+# Run from pythonScripts/:  python -m benchmarks.serializationBenchmark [--sizes 10000 100000]
+import json
+import time
+import random
+import argparse
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastJson import dumps, orjson
+
+def make_documents(count, seed=0):
+    rng = random.Random(seed)
+    tickers = ["GME", "AMC", "TSLA", "NVDA", "AAPL", "PLTR", "AMD", "SPY"]
+    return [
+        {
+            "_id": ObjectId(),
+            "ticker": rng.sample(tickers, rng.randint(1, 3)),
+            "sentiment": rng.choice([-1, 0, 1]),
+            "confidence": rng.random(),
+            "date": f"2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "preprocessedPost": " ".join(rng.choice(["moon", "calls", "puts", "hold", "buy", "tendies"]) for _ in range(20)),
+            "originalPost": "Holding my calls until the moon 🚀🚀 " * 3,
+        }
+        for _ in range(count)
+    ]
+
+def old_path(documents):
+    # serialize_document per post, then FastAPI's JSONResponse (jsonable_encoder + json.dumps).
+    posts = []
+    for doc in documents:
+        doc = dict(doc)
+        doc["_id"] = str(doc["_id"])
+        posts.append(doc)
+    content = jsonable_encoder({"ticker": "GME", "posts": posts})
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def new_path(documents):
+    return dumps({"ticker": "GME", "posts": documents})
+
+def best_of(function, documents, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function(documents)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API response serialization.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    for size in args.sizes:
+        documents = make_documents(size)
+        assert json.loads(old_path(documents)) == json.loads(new_path(documents))
+        old_seconds = best_of(old_path, documents, args.repeats)
+        new_seconds = best_of(new_path, documents, args.repeats)
+        print(f"{size:>8} docs  old {old_seconds * 1000:8.1f} ms  new {new_seconds * 1000:8.1f} ms  speedup {old_seconds / new_seconds:5.1f}x")
+
+if __name__ == "__main__":
+    main()
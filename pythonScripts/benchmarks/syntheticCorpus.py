@@ -0,0 +1,85 @@
+# Seeded generator of WSB-like posts in the same shape as the Kaggle dataset (id, body, timestamp).
+# Run from pythonScripts/:  python -m benchmarks.syntheticCorpus --rows 100000 --output synthetic.csv
+import random
+import argparse
+from datetime import datetime, timedelta
+import pandas as pd
+
+TICKERS = ["GME", "AMC", "TSLA", "NVDA", "AAPL", "PLTR", "AMD", "MSFT", "SPY", "QQQ", "AMZN", "META", "GOOG", "SOFI", "HOOD", "RIVN", "NIO", "CLOV"]
+WORDS = [
+    "moon", "tendies", "apes", "hold", "holding", "diamond", "hands", "paper", "yolo", "calls", "puts", "squeeze",
+    "short", "shorts", "earnings", "dip", "buy", "buying", "sell", "selling", "bagholder", "rocket", "gains", "loss",
+    "portfolio", "options", "expiry", "strike", "premium", "theta", "market", "bears", "bulls", "fed", "rates",
+    "inflation", "guh", "wife", "boyfriend", "wendys", "dumpster", "printer", "brrr", "stonks", "to", "the", "and",
+    "is", "my", "this", "going", "up", "down", "today", "tomorrow", "week", "money", "all", "in", "on", "again",
+]
+CONTRACTIONS = ["I'm", "can't", "won't", "it's", "gonna", "y'all", "don't", "they're", "wanna", "shouldn't've", "ain't", "we're"]
+EMOJIS = ["🚀", "💎", "🙌", "🦍", "🌕", "📈", "📉", "🧻", "🤡", "🐻", "🐂"]
+BOILERPLATE = [
+    "Your daily trading discussion thread. Please keep the shitposting to a minimum.",
+    "Your daily hype thread. Use this thread to hype up your favourite ticker.",
+    "Your weekend discussion thread. Please use this thread to discuss your plays for next week.",
+    "Welcome to WSB! Read the rules before posting.",
+    "This is an old Yacht Club thread, please use the new one.",
+    "You already have a bet on this ticker.",
+]
+
+def random_ticker(rng):
+    ticker = rng.choice(TICKERS)
+    return "$" + ticker if rng.random() < 0.2 else ticker
+
+def normal_post(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(4, 60))]
+    for _ in range(rng.randint(1, 3)):
+        words.insert(rng.randrange(len(words) + 1), random_ticker(rng))
+    if rng.random() < 0.5:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(CONTRACTIONS))
+    if rng.random() < 0.4:
+        words.append("".join(rng.choice(EMOJIS) for _ in range(rng.randint(1, 5))))
+    if rng.random() < 0.15:
+        words.append(f"https://www.reddit.com/r/wallstreetbets/comments/{rng.getrandbits(32):x}")
+    if rng.random() < 0.05:
+        words.insert(0, f"![img](emote|t5_2th52|{rng.randint(1000, 9999)})")
+    post = " ".join(words)
+    return post.upper() if rng.random() < 0.05 else post.capitalize()
+
+def number_post(rng):
+    numbers = [str(rng.randint(1, 1000)) for _ in range(rng.randint(4, 12))]
+    return f"{rng.choice(TICKERS)} {rng.randint(1, 12)}/{rng.randint(1, 28)} " + " ".join(numbers) + " calls"
+
+def generate_post(rng):
+    """One post body; the mix roughly follows the kinds of posts the preprocessing filters out or keeps."""
+    kind = rng.random()
+    if kind < 0.05:
+        return rng.choice(BOILERPLATE) + " " + normal_post(rng)
+    if kind < 0.08:
+        return f"*Processing img {rng.getrandbits(40):x}...*"
+    if kind < 0.13:
+        return number_post(rng)
+    if kind < 0.18:
+        return rng.choice(TICKERS)
+    if kind < 0.20:
+        return None
+    if kind < 0.30 and rng.random() < 0.5:
+        return normal_post(rng) + "\n\n" + normal_post(rng)
+    return normal_post(rng)
+
+def generate_corpus(rows, seed=0):
+    """DataFrame of rows synthetic posts; the same seed always gives the same corpus."""
+    rng = random.Random(seed)
+    start = datetime(2022, 1, 1)
+    return pd.DataFrame({
+        "id": [f"{rng.getrandbits(32):x}" for _ in range(rows)],
+        "body": [generate_post(rng) for _ in range(rows)],
+        "timestamp": [(start + timedelta(seconds=rng.randrange(365 * 24 * 3600))).strftime("%Y-%m-%d %H:%M:%S") for _ in range(rows)],
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic WSB-like corpus in the Kaggle dataset's format.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="syntheticWSBposts.csv")
+    args = parser.parse_args()
+
+    generate_corpus(args.rows, args.seed).to_csv(args.output, index=False)
+    print(f"{args.rows} synthetic posts saved to {args.output}")
@@ -0,0 +1,42 @@
+# Builds a tiny randomly initialised BERT classifier with finbert-tone's labels so model stages can be benchmarked offline.
+# Its predictions are meaningless; only its shape (tokenizer, 3 labels, 512 positions) matches the real model.
+import os
+import string
+import torch
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+from sentimentInference import LABELS
+from benchmarks.syntheticCorpus import CONTRACTIONS, TICKERS, WORDS
+
+TINY_MODEL_DIR = os.path.join("modelCache", "benchmark-tiny-bert")
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+def build_vocab():
+    characters = list(string.ascii_lowercase + string.digits + string.punctuation)
+    words = WORDS + [ticker.lower() for ticker in TICKERS] + [word.lower() for word in CONTRACTIONS]
+    return list(dict.fromkeys(SPECIAL_TOKENS + characters + ["##" + c for c in characters] + words))
+
+def build_tiny_model(path=TINY_MODEL_DIR, seed=0):
+    """Saves the tiny model and tokenizer to path, unless they are already there, and returns path."""
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+    os.makedirs(path, exist_ok=True)
+
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(build_vocab()) + "\n")
+    BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True).save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(build_vocab()),
+        hidden_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=128,
+        max_position_embeddings=512,
+        num_labels=len(LABELS),
+        id2label=dict(enumerate(LABELS)),
+        label2id={label: i for i, label in enumerate(LABELS)},
+    )
+    BertForSequenceClassification(config).save_pretrained(path)
+    return path
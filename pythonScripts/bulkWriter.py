@@ -0,0 +1,111 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+
+POST_KEY_FIELD = "postKey"
+# IndexOptionsConflict and IndexKeySpecsConflict: an index with the same name exists with other options
+INDEX_OPTIONS_CONFLICT_CODES = (85, 86)
+
+def add_post_keys(df):
+    """Adds a deterministic postKey column to the processed posts.
+
+    Every ingest path (mongoInsert2 and streamingIngest) keys documents with
+    this, so a post written by both maps to one document. A post with its
+    Reddit id is keyed on the id alone, so re-runs and redeliveries of it
+    produce the same key. A post without one (in processed files written
+    before the id was kept) is keyed on its date and original post together
+    with how many times that same (date, post) pair appeared before it, so
+    exact duplicate posts still get their own document.
+    """
+    ids = df["id"] if "id" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    occurrence = df.groupby(["date", "body"], sort=False, dropna=False).cumcount()
+    df[POST_KEY_FIELD] = [
+        hashlib.sha256((f"id\0{post_id}" if pd.notna(post_id) else f"{date}\0{body}\0{count}").encode("utf-8")).hexdigest()
+        for post_id, date, body, count in zip(ids, df["date"], df["body"], occurrence)
+    ]
+    return df
+
+async def ensure_post_key_index(collection):
+    """Unique index on postKey, over keyed documents only.
+
+    Documents written before posts were keyed have no postKey; the partial
+    filter keeps them from colliding with each other as duplicate null keys.
+    An earlier index on postKey without the filter is replaced.
+    """
+    options = {"unique": True, "partialFilterExpression": {POST_KEY_FIELD: {"$exists": True}}}
+    try:
+        await collection.create_index(POST_KEY_FIELD, **options)
+    except OperationFailure as e:
+        if e.code not in INDEX_OPTIONS_CONFLICT_CODES:
+            raise
+        await collection.drop_index(f"{POST_KEY_FIELD}_1")
+        await collection.create_index(POST_KEY_FIELD, **options)
+
+async def bulk_upsert(collection, documents):
+    """Upserts documents by postKey in one unordered bulk_write.
+
+    Returns the BulkWriteResult. Because every write is keyed, re-sending a
+    chunk that was already written leaves the collection unchanged.
+    """
+    operations = [ReplaceOne({POST_KEY_FIELD: document[POST_KEY_FIELD]}, document, upsert=True) for document in documents]
+    return await collection.bulk_write(operations, ordered=False)
+
+async def stored_versions(collection, documents):
+    """The stored versions of the documents about to be upserted, with only the fields the rollups use."""
+    keys = [document[POST_KEY_FIELD] for document in documents]
+    projection = {"_id": 0, "ticker": 1, "date": 1, "sentiment": 1, "confidence": 1}
+    return await collection.find({POST_KEY_FIELD: {"$in": keys}}, projection).to_list(length=None)
+
+class Checkpoint:
+    """Tracks how far an ingest run has got so a crashed run can resume.
+
+    Chunks are numbered in the order they are read and can be acknowledged
+    out of order by concurrent writers. The checkpoint only advances over the
+    longest run of acknowledged chunks from the start, and stores the last
+    source row of that run. It is tied to the size and modification time of
+    the source file and is ignored if the file has changed.
+    """
+
+    def __init__(self, path, source_file):
+        self.path = path
+        stat = os.stat(source_file)
+        self.source = {"file": os.path.abspath(source_file), "size": stat.st_size, "mtime": stat.st_mtime}
+        self.last_row = -1
+        self.next_chunk = 0
+        self.chunk_last_rows = {}
+        self.acknowledged = set()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved.get("source") == self.source:
+                self.last_row = saved["last_row"]
+
+    def register(self, chunk_id, last_row):
+        """Records the last source row of a chunk before it is written."""
+        self.chunk_last_rows[chunk_id] = last_row
+
+    def acknowledge(self, chunk_id):
+        """Marks a chunk as written and saves the checkpoint if it advanced."""
+        self.acknowledged.add(chunk_id)
+        advanced = False
+        while self.next_chunk in self.acknowledged:
+            self.acknowledged.remove(self.next_chunk)
+            self.last_row = self.chunk_last_rows.pop(self.next_chunk)
+            self.next_chunk += 1
+            advanced = True
+        if advanced:
+            self.save()
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"source": self.source, "last_row": self.last_row}, file)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
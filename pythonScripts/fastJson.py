@@ -0,0 +1,36 @@
+import json
+from datetime import date, datetime
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import Response
+
+# orjson is optional; without it responses fall back to the standard library encoder.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def encode_bson_value(value):
+    """Encode the BSON types the JSON encoders do not know about."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(payload):
+    """Encode a payload of MongoDB documents straight to JSON bytes.
+
+    ObjectId values are written as their hex string as they are encoded, so
+    documents from the cursor do not need to be rewritten first.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=encode_bson_value)
+    return json.dumps(payload, default=encode_bson_value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class JSONBytesResponse(Response):
+    """JSON response for a payload that has already been encoded with dumps()."""
+
+    media_type = "application/json"
@@ -0,0 +1,121 @@
+import os
+import re
+import inspect
+from types import SimpleNamespace
+import torch
+from transformers import AutoModelForSequenceClassification
+
+# onnxruntime is optional; it is only needed for the "onnx" and "onnx-int8" backends.
+try:
+    import onnxruntime
+    from onnxruntime.quantization import QuantType, quantize_dynamic as quantize_onnx_dynamic
+except ImportError:
+    onnxruntime = None
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+MODEL_CACHE_DIR = "modelCache"
+ONNX_OPSET = 17
+# Weight type of the onnx-int8 backend's dynamically quantized graph
+ONNX_INT8_WEIGHT_TYPE = "QInt8"
+
+# What each backend actually runs. Backends don't give identical labels and confidences, so results are
+# cached per variant (see results_model_name) and one backend's results are never served to another.
+BACKEND_VARIANTS = {
+    "torch": "torch-fp32",
+    "torch-int8": "torch-int8-dynamic-linear",
+    "onnx": f"onnx-fp32-opset{ONNX_OPSET}",
+    "onnx-int8": f"onnx-int8-dynamic-{ONNX_INT8_WEIGHT_TYPE}-opset{ONNX_OPSET}",
+}
+
+def results_model_name(model_name, backend):
+    """The model name sentiment results are cached under: the model plus its backend and quantization variant."""
+    if backend not in BACKEND_VARIANTS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+    return f"{model_name}@{BACKEND_VARIANTS[backend]}"
+
+def artifact_dir(model_name, backend, cache_dir=MODEL_CACHE_DIR):
+    """Local directory for the exported or quantized artifacts of one model and backend."""
+    path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name), backend)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def load_torch_int8(model_name):
+    """fp32 model with its Linear layers dynamically quantized to int8.
+
+    Quantizing takes a few seconds, so it is redone at load time instead of
+    caching a pickled quantized state dict, which does not load reliably across
+    torch versions. Use onnx-int8 for a quantized model cached on disk.
+    """
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxSequenceClassifier:
+    """Runs an exported classification graph with onnxruntime behind the torch model interface.
+
+    Calling it with the tokenizer's tensors returns an object whose .logits
+    is a torch tensor, so predict_batch works the same for every backend.
+    """
+
+    def __init__(self, onnx_file):
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+
+    def __call__(self, **inputs):
+        feed = {name: inputs[name].numpy() for name in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+def export_onnx(model_name, tokenizer, onnx_file):
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    # Inputs are traced positionally, so they have to follow the order of forward()'s parameters.
+    input_names = [name for name in inspect.signature(model.forward).parameters if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    torch.onnx.export(
+        model,
+        tuple(sample[name] for name in input_names),
+        onnx_file,
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=ONNX_OPSET,
+        dynamo=False,
+    )
+
+def load_onnx(model_name, tokenizer, cache_dir=MODEL_CACHE_DIR, quantize=False):
+    """Exported ONNX graph run with onnxruntime.
+
+    The fp32 export (and, with quantize, its int8 dynamically quantized copy)
+    is made once and cached under cache_dir.
+    """
+    if onnxruntime is None:
+        raise ImportError("The onnx backends need onnxruntime (pip install onnxruntime onnx).")
+    onnx_file = os.path.join(artifact_dir(model_name, "onnx", cache_dir), "model.onnx")
+    if not os.path.exists(onnx_file):
+        export_onnx(model_name, tokenizer, onnx_file)
+    if not quantize:
+        return OnnxSequenceClassifier(onnx_file)
+
+    int8_file = os.path.join(artifact_dir(model_name, "onnx-int8", cache_dir), "model-int8.onnx")
+    if not os.path.exists(int8_file):
+        quantize_onnx_dynamic(onnx_file, int8_file, weight_type=QuantType[ONNX_INT8_WEIGHT_TYPE])
+    return OnnxSequenceClassifier(int8_file)
+
+def load_backend(backend, model_name, tokenizer, cache_dir=MODEL_CACHE_DIR):
+    """Load the sentiment model for one of BACKENDS."""
+    if backend == "torch":
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        return model
+    if backend == "torch-int8":
+        return load_torch_int8(model_name)
+    if backend == "onnx":
+        return load_onnx(model_name, tokenizer, cache_dir)
+    if backend == "onnx-int8":
+        return load_onnx(model_name, tokenizer, cache_dir, quantize=True)
+    raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
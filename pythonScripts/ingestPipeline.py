@@ -0,0 +1,55 @@
+import asyncio
+
+QUEUE_SIZE = 4
+WRITER_TASKS = 2
+
+async def run_pipeline(chunks, score_chunk, write_chunk, queue_size=QUEUE_SIZE, writer_tasks=WRITER_TASKS, executor=None):
+    """Overlaps CPU-bound scoring with database writes.
+
+    score_chunk(chunk) is a blocking function that runs in an executor so the
+    event loop stays free; it returns the documents for that chunk. The
+    documents go through a bounded queue to writer_tasks concurrent
+    write_chunk(documents) coroutines. When the queue is full, scoring waits
+    for the writers, so memory stays bounded if the database is slow.
+
+    chunks can also be an async iterable, such as a stream of micro-batches.
+    It is only advanced when the queue has room, so a slow writer holds back
+    the source as well.
+
+    The first error raised by scoring or writing cancels the other tasks and
+    is re-raised.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+
+    async def score(chunk):
+        documents = await loop.run_in_executor(executor, score_chunk, chunk)
+        await queue.put(documents)
+
+    async def producer():
+        if hasattr(chunks, "__aiter__"):
+            async for chunk in chunks:
+                await score(chunk)
+        else:
+            for chunk in chunks:
+                await score(chunk)
+        for _ in range(writer_tasks):
+            await queue.put(None)
+
+    async def writer():
+        while True:
+            documents = await queue.get()
+            if documents is None:
+                return
+            await write_chunk(documents)
+
+    tasks = [asyncio.create_task(producer())] + [asyncio.create_task(writer()) for _ in range(writer_tasks)]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
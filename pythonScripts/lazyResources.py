@@ -0,0 +1,39 @@
+import os
+from functools import lru_cache
+
+# Every heavy object the pipeline needs is created here on first use and then reused.
+# torch, transformers and motor are only imported inside these functions, so importing a
+# pipeline module (for a test, a benchmark or a worker process) stays fast and has no side effects.
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name)
+
+@lru_cache(maxsize=None)
+def get_model(model_name, backend="torch"):
+    """The sentiment model for one of inferenceBackends.BACKENDS."""
+    from inferenceBackends import load_backend
+    return load_backend(backend, model_name, get_tokenizer(model_name))
+
+@lru_cache(maxsize=None)
+def get_mongo_client():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        raise ValueError("❌ MONGO_URI is not set. Check your .env file or environment variables.")
+    return AsyncIOMotorClient(uri)
+
+def get_database(name):
+    return get_mongo_client()[name]
+
+@lru_cache(maxsize=None)
+def get_sentiment_cache(model_name, path, max_entries):
+    from sentimentCache import SentimentCache
+    return SentimentCache(model_name, path, max_entries)
+
+@lru_cache(maxsize=None)
+def get_ticker_index(csv_file, column, index_file=None):
+    """Ticker automaton for a symbol list (see tickerIndex.py), built or loaded from index_file once per process."""
+    from tickerIndex import loadTickerIndex
+    return loadTickerIndex(csv_file, column, index_file)
@@ -1,10 +1,24 @@
 import os
+import re
+import hmac
+import json
+import base64
+import time
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request, Depends
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request, Depends, Query, Header
+from fastapi.responses import StreamingResponse, Response
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from bson import ObjectId
+from bson.errors import InvalidId
 from fastapi.middleware.cors import CORSMiddleware
+from rollups import ROLLUP_COLLECTION_NAME, ensure_rollup_index
+from queryProfiler import QueryProfiler
+from responseCache import INGEST_STATUS_COLLECTION_NAME, ResponseCache, read_ingest_status
+from fastJson import JSONBytesResponse, dumps
+from metrics import MetricsRegistry, RouteLatencyMiddleware
+from structuredLogging import get_logger
 
 load_dotenv()
 
@@ -12,9 +26,42 @@ MONGO_URI = os.getenv("MONGODB_URI")
 DB_NAME = "sentiment-analysis"
 COLLECTION_NAME = "posts"
 
-print(f"🔍 MONGO_URI Loaded: {MONGO_URI}")  # Debug: Check if MongoDB URI is loaded
+# Pagination limits for the list endpoints
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH_SIZE = 1000
+
+# Limits for the post search endpoint
+MAX_QUERY_TICKERS = 20
+SENTIMENT_VALUES = {"positive": 1, "neutral": 0, "negative": -1}
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+# Optional slow-query instrumentation (QUERY_PROFILING=1 explains every query in the background)
+profiler = QueryProfiler(
+    enabled=os.getenv("QUERY_PROFILING") == "1",
+    slow_ms=float(os.getenv("SLOW_QUERY_MS", "100")),
+)
+# The profiler's report is only served on /debug/queries with DEBUG_QUERIES=1 (and the admin token)
+DEBUG_QUERIES = os.getenv("DEBUG_QUERIES") == "1"
+
+# In-process cache of ticker responses, dropped whenever an ingest run completes
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300")),
+)
+INGEST_STATUS_CHECK_SECONDS = float(os.getenv("INGEST_STATUS_CHECK_SECONDS", "5"))
+
+# Token the admin routes (e.g. POST /cache/invalidate) require in the X-Admin-Token header; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+logger = get_logger("api")
+logger.info("MONGODB_URI is %s", "set" if MONGO_URI else "not set")
+
+# Route latency histograms and MongoDB call timings, served on /metrics
+metrics = MetricsRegistry()
 
 app = FastAPI()
+app.add_middleware(RouteLatencyMiddleware, registry=metrics)
 
 # ✅ Add CORS middleware
 app.add_middleware(
@@ -34,12 +81,27 @@ async def startup_db_client():
     """Initialize MongoDB connection when FastAPI starts."""
     global client, db
     try:
-        print("🚀 Connecting to MongoDB...")  # Debugging log
+        logger.info("Connecting to MongoDB")
         client = AsyncIOMotorClient(MONGO_URI)
         db = client[DB_NAME]
-        print("✅ MongoDB Connected!")
-    except Exception as e:
-        print(f"❌ MongoDB Connection Error: {e}")  # Debugging log
+        logger.info("MongoDB connected")
+    except Exception:
+        logger.exception("MongoDB connection error")
+        return
+
+    try:
+        await ensure_indexes(db)
+        logger.info("MongoDB indexes ready")
+    except Exception:
+        logger.exception("MongoDB index error")
+
+async def ensure_indexes(db):
+    """Create the indexes the read endpoints rely on (no-op if they already exist)."""
+    posts = db[COLLECTION_NAME]
+    await posts.create_index("ticker")  # Multikey, since ticker is an array
+    await posts.create_index([("ticker", 1), ("date", 1)])
+    await posts.create_index([("ticker", 1), ("confidence", 1)])  # Search results sorted by confidence
+    await ensure_rollup_index(db[ROLLUP_COLLECTION_NAME])
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
@@ -47,47 +109,411 @@ async def shutdown_db_client():
     global client
     if client:
         client.close()
-        print("🛑 MongoDB connection closed")  # Debugging log
+        logger.info("MongoDB connection closed")
 
 def get_db():
     """Dependency to get the database instance."""
     global db
     if db is None:
-        print("❌ Database connection is not initialized!")  # Debugging log
+        logger.error("Database connection is not initialized")
         raise HTTPException(status_code=500, detail="Database connection not initialized")
     return db
 
-def serialize_document(doc):
-    """Convert MongoDB document to JSON-serializable format."""
-    doc["_id"] = str(doc["_id"])  # Convert ObjectId to string
-    return doc
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency for the admin routes: 404 unless ADMIN_TOKEN is set, 403 unless the request sends it."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def require_debug_queries():
+    """Dependency for /debug/queries: 404 unless DEBUG_QUERIES=1."""
+    if not DEBUG_QUERIES:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+def record_mongo(operation, collection, started):
+    """Adds a MongoDB call that began at started (a perf_counter value) to the /metrics histograms."""
+    labels = {"operation": operation, "collection": collection.name}
+    metrics.observe("mongo_operation_duration_seconds", labels, time.perf_counter() - started, "MongoDB call latency by operation")
+
+def encode_cursor(doc, sort_fields):
+    """Build the opaque cursor pointing just after doc for the given sort order."""
+    position = {field: str(doc[field]) if field == "_id" else doc.get(field) for field in sort_fields}
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+def valid_cursor_value(field, value):
+    """True if a decoded cursor value has its sort field's type, so a crafted cursor can't carry query operators.
+
+    None is allowed for the sort fields other than _id, as encode_cursor writes it for a document missing the field.
+    """
+    if field == "_id":
+        return isinstance(value, str) and ObjectId.is_valid(value)
+    if value is None:
+        return True
+    if field == "date":
+        return isinstance(value, str) and re.match(DATE_PATTERN, value) is not None
+    if field == "confidence":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return False
+
+def decode_cursor(cursor, sort_fields, direction=1):
+    """Turn an opaque cursor back into a keyset filter for the given sort order (1 ascending, -1 descending)."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not all(valid_cursor_value(field, position[field]) for field in sort_fields):
+            raise ValueError("cursor value of the wrong type")
+        values = [ObjectId(position[field]) if field == "_id" else position[field] for field in sort_fields]
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Rows strictly after the cursor: (a > x) or (a == x and b > y) ... ($lt when descending)
+    clauses = []
+    for i, field in enumerate(sort_fields):
+        clause = {sort_fields[j]: values[j] for j in range(i)}
+        clause.update(after_value(field, values[i], direction))
+        clauses.append(clause)
+    return {"$or": clauses} if len(clauses) > 1 else clauses[0]
+
+def after_value(field, value, direction):
+    """Filter for the values of one sort field that come strictly after value.
+
+    MongoDB sorts a missing or null field before every value, but $gt and $lt
+    never match it, so null positions need their own comparisons.
+    """
+    if direction == 1:
+        return {field: {"$ne": None}} if value is None else {field: {"$gt": value}}
+    if value is None:
+        return {field: {"$lt": None}}  # Matches nothing: null is already the last position
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+def build_projection(fields, sort_fields):
+    """Projection for a comma-separated field list; the sort fields are always kept for the cursor."""
+    if not fields:
+        return None
+    projection = {field.strip(): 1 for field in fields.split(",") if field.strip()}
+    projection.update({field: 1 for field in sort_fields})
+    return projection
+
+async def fetch_page(collection, query, sort_fields, limit, cursor, fields, direction=1):
+    """Fetch one page of documents using keyset pagination on sort_fields."""
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor, sort_fields, direction)]}
+    sort = [(field, direction) for field in sort_fields]
+    started = profiler.start()
+    find_cursor = collection.find(query, build_projection(fields, sort_fields)).sort(sort).limit(limit)
+    posts = await find_cursor.to_list(length=limit)
+    record_mongo("fetch_page", collection, started)
+    profiler.record("fetch_page", collection, query, started, sort, limit)
+    next_cursor = encode_cursor(posts[-1], sort_fields) if len(posts) == limit else None
+    return posts, next_cursor
+
+async def stream_ndjson(collection, query, sort_fields, fields):
+    """Yield documents one JSON line at a time as the Motor cursor returns them."""
+    sort = [(field, 1) for field in sort_fields]
+    started = profiler.start()
+    find_cursor = collection.find(query, build_projection(fields, sort_fields), batch_size=STREAM_BATCH_SIZE).sort(sort)
+    async for post in find_cursor:
+        yield dumps(post) + b"\n"
+    record_mongo("stream_ndjson", collection, started)
+    profiler.record("stream_ndjson", collection, query, started, sort)
+
+async def refresh_data_version(db):
+    """Check (at most every few seconds) whether an ingest run finished, and drop stale responses if so."""
+    now = time.monotonic()
+    if now - response_cache.version_checked_at < INGEST_STATUS_CHECK_SECONDS:
+        return
+    response_cache.version_checked_at = now
+    try:
+        started = time.perf_counter()
+        status = await read_ingest_status(db) or {}
+        record_mongo("read_ingest_status", db[INGEST_STATUS_COLLECTION_NAME], started)
+        response_cache.update_data_version(status.get("version"), status.get("completedAt"))
+    except Exception:
+        logger.exception("Error reading ingest status")
+
+def normalize_fields(fields):
+    return ",".join(sorted(field.strip() for field in fields.split(",") if field.strip())) if fields else None
+
+async def cached_json_response(request, db, key, build_payload):
+    """Serve a JSON response from the response cache, building it on a miss.
+
+    Responses carry ETag and Last-Modified, and a matching If-None-Match or
+    If-Modified-Since gets an empty 304.
+    """
+    await refresh_data_version(db)
+    entry = response_cache.get(key)
+    if entry is None:
+        payload = await build_payload()
+        entry = response_cache.put(key, dumps(payload))
+
+    headers = entry.headers()
+    if entry.not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    return JSONBytesResponse(entry.body, headers=headers)
+
+ALL_POSTS_SORT = ["_id"]
+TICKER_POSTS_SORT = ["date", "_id"]
+
+# Sort orders for the post endpoints: the fields to paginate on and their direction
+POST_SORTS = {
+    "date": (TICKER_POSTS_SORT, 1),
+    "-date": (TICKER_POSTS_SORT, -1),
+    "confidence": (["confidence", "_id"], 1),
+    "-confidence": (["confidence", "_id"], -1),
+}
+
+def parse_list(value):
+    """Split a comma-separated query parameter, dropping empty items."""
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+def build_post_query(tickers, start=None, end=None, sentiment=None):
+    """One filter for the ticker, date range and sentiment filters, served by the ticker_1_date_1 index.
+
+    Raises a 400 for no tickers, too many tickers or an unknown sentiment.
+    """
+    if not tickers:
+        raise HTTPException(status_code=400, detail="At least one ticker is required")
+    if len(tickers) > MAX_QUERY_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_QUERY_TICKERS} tickers can be queried at once")
+    query = {"ticker": {"$in": tickers}}
+    date_range = {}
+    if start:
+        date_range["$gte"] = start
+    if end:
+        date_range["$lte"] = end
+    if date_range:
+        query["date"] = date_range
+    sentiments = parse_list(sentiment)
+    if sentiments:
+        unknown = [value for value in sentiments if value.lower() not in SENTIMENT_VALUES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sentiment {unknown[0]!r}; use {', '.join(SENTIMENT_VALUES)}")
+        query["sentiment"] = {"$in": sorted({SENTIMENT_VALUES[value.lower()] for value in sentiments})}
+    return query
+
+def get_sort(sort):
+    if sort not in POST_SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort {sort!r}; use {', '.join(POST_SORTS)}")
+    return POST_SORTS[sort]
+
+async def count_posts(collection, query, tickers):
+    """Post counts and average sentiment for a filter, overall and per ticker, from one aggregation."""
+    pipeline = [
+        {"$match": query},
+        {"$facet": {
+            "bySentiment": [{"$group": {"_id": "$sentiment", "posts": {"$sum": 1}}}],
+            "byTicker": [
+                {"$project": {"_id": 0, "sentiment": 1, "ticker": {"$setUnion": ["$ticker", []]}}},  # Counts each post once per ticker
+                {"$unwind": "$ticker"},
+                {"$match": {"ticker": {"$in": tickers}}},
+                {"$group": {"_id": "$ticker", "posts": {"$sum": 1}, "sentimentSum": {"$sum": "$sentiment"}}},
+            ],
+        }},
+    ]
+    started = profiler.start()
+    facets = (await collection.aggregate(pipeline).to_list(length=1))[0]
+    record_mongo("count_posts", collection, started)
+    profiler.record("count_posts", collection, query, started)
+
+    labels = {value: label for label, value in SENTIMENT_VALUES.items()}
+    by_sentiment = {label: 0 for label in SENTIMENT_VALUES}
+    sentiment_sum = 0
+    for group in facets["bySentiment"]:
+        by_sentiment[labels.get(group["_id"], "neutral")] += group["posts"]
+        sentiment_sum += (group["_id"] or 0) * group["posts"]
+    total = sum(by_sentiment.values())
+    by_ticker = {ticker: {"posts": 0, "averageSentiment": None} for ticker in tickers}
+    for group in facets["byTicker"]:
+        by_ticker[group["_id"]] = {"posts": group["posts"], "averageSentiment": group["sentimentSum"] / group["posts"]}
+    return {
+        "posts": total,
+        "averageSentiment": sentiment_sum / total if total else None,
+        "bySentiment": by_sentiment,
+        "byTicker": by_ticker,
+    }
 
 @app.get("/")
-async def root(db=Depends(get_db)):
+async def root(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db=Depends(get_db),
+):
+    try:
+        posts, next_cursor = await fetch_page(db[COLLECTION_NAME], {}, ALL_POSTS_SORT, limit, cursor, fields)
+        logger.debug("Retrieved %d posts", len(posts))
+        return JSONBytesResponse(dumps({"posts": posts if posts else "No posts found", "next_cursor": next_cursor}))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error fetching posts")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/stream")
+async def stream_posts(fields: Optional[str] = None, db=Depends(get_db)):
+    """Stream every post as newline-delimited JSON."""
+    return StreamingResponse(
+        stream_ndjson(db[COLLECTION_NAME], {}, ALL_POSTS_SORT, fields),
+        media_type="application/x-ndjson",
+    )
+
+@app.get("/posts")
+async def search_posts(
+    request: Request,
+    tickers: str = Query(..., description="Comma-separated tickers, e.g. GME,AMC"),
+    start: Optional[str] = Query(None, pattern=DATE_PATTERN, description="First day (YYYY-MM-DD), inclusive"),
+    end: Optional[str] = Query(None, pattern=DATE_PATTERN, description="Last day (YYYY-MM-DD), inclusive"),
+    sentiment: Optional[str] = Query(None, description="Comma-separated sentiments to keep: positive, neutral, negative"),
+    sort: str = Query("date", description="date, -date, confidence or -confidence"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db=Depends(get_db),
+):
+    """Posts for several tickers, filtered by date range and sentiment, in one paginated query.
+
+    The first page (no cursor) also carries counts for the whole filter: the
+    number of posts, per sentiment and per ticker, and the average
+    sentiment, so clients don't need every page to summarize a query.
+    """
     try:
-        print("📢 Fetching all posts...")  # Debugging log
-        cursor = db[COLLECTION_NAME].find({})
-        posts = await cursor.to_list(length=None)
-        posts = [serialize_document(post) for post in posts]
-        print(f"✅ Retrieved {len(posts)} posts.")  # Debugging log
-        return {"posts": posts if posts else "No posts found"}
+        ticker_list = list(dict.fromkeys(ticker.upper() for ticker in parse_list(tickers)))
+        query = build_post_query(ticker_list, start, end, sentiment)
+        sort_fields, direction = get_sort(sort)
+
+        async def build_payload():
+            collection = db[COLLECTION_NAME]
+            posts, next_cursor = await fetch_page(collection, query, sort_fields, limit, cursor, fields, direction)
+            logger.debug("Retrieved %d posts for %s", len(posts), ",".join(ticker_list))
+            payload = {
+                "tickers": ticker_list,
+                "filters": {"start": start, "end": end, "sentiment": parse_list(sentiment) or None, "sort": sort},
+                "posts": posts if posts else "No posts found",
+                "next_cursor": next_cursor,
+            }
+            if not cursor:
+                payload["counts"] = await count_posts(collection, query, ticker_list)
+            return payload
+
+        key = ("posts", tuple(ticker_list), start, end, repr(query.get("sentiment")), sort, limit, cursor, normalize_fields(fields))
+        return await cached_json_response(request, db, key, build_payload)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error fetching posts: {e}")  # Debugging log
+        logger.exception("Error searching posts")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/ticker/{stock_ticker}")
-async def get_ticker_posts(stock_ticker: str, db=Depends(get_db)):
+async def get_ticker_posts(
+    request: Request,
+    stock_ticker: str,
+    start: Optional[str] = Query(None, pattern=DATE_PATTERN, description="First day (YYYY-MM-DD), inclusive"),
+    end: Optional[str] = Query(None, pattern=DATE_PATTERN, description="Last day (YYYY-MM-DD), inclusive"),
+    sentiment: Optional[str] = Query(None, description="Comma-separated sentiments to keep: positive, neutral, negative"),
+    sort: str = Query("date", description="date, -date, confidence or -confidence"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db=Depends(get_db),
+):
     try:
-        print(f"📢 Fetching posts for ticker: {stock_ticker.upper()}")  # Debugging log
-        cursor = db[COLLECTION_NAME].find({"ticker": {"$in": [stock_ticker.upper()]}})
-        posts = await cursor.to_list(length=None)
-        posts = [serialize_document(post) for post in posts]
-        print(f"✅ Retrieved {len(posts)} posts for {stock_ticker.upper()}")  # Debugging log
-        return {"ticker": stock_ticker.upper(), "posts": posts if posts else "No posts found"}
+        query = build_post_query([stock_ticker.upper()], start, end, sentiment)
+        sort_fields, direction = get_sort(sort)
+
+        async def build_payload():
+            posts, next_cursor = await fetch_page(db[COLLECTION_NAME], query, sort_fields, limit, cursor, fields, direction)
+            logger.debug("Retrieved %d posts for %s", len(posts), stock_ticker.upper())
+            return {"ticker": stock_ticker.upper(), "posts": posts if posts else "No posts found", "next_cursor": next_cursor}
+
+        key = ("ticker", stock_ticker.upper(), start, end, repr(query.get("sentiment")), sort, limit, cursor, normalize_fields(fields))
+        return await cached_json_response(request, db, key, build_payload)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error fetching ticker posts: {e}")  # Debugging log
+        logger.exception("Error fetching ticker posts")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/ticker/{stock_ticker}/stream")
+async def stream_ticker_posts(stock_ticker: str, fields: Optional[str] = None, db=Depends(get_db)):
+    """Stream every post for a ticker as newline-delimited JSON."""
+    query = {"ticker": {"$in": [stock_ticker.upper()]}}
+    return StreamingResponse(
+        stream_ndjson(db[COLLECTION_NAME], query, TICKER_POSTS_SORT, fields),
+        media_type="application/x-ndjson",
+    )
+
+@app.get("/ticker/{stock_ticker}/daily")
+async def get_ticker_daily_sentiment(
+    request: Request,
+    stock_ticker: str,
+    start: Optional[str] = Query(None, pattern=DATE_PATTERN, description="First day (YYYY-MM-DD), inclusive"),
+    end: Optional[str] = Query(None, pattern=DATE_PATTERN, description="Last day (YYYY-MM-DD), inclusive"),
+    db=Depends(get_db),
+):
+    """Daily post count and average sentiment for a ticker, served from the rollup collection."""
+    try:
+        query = {"ticker": stock_ticker.upper()}
+        date_range = {}
+        if start:
+            date_range["$gte"] = start
+        if end:
+            date_range["$lte"] = end
+        if date_range:
+            query["date"] = date_range
+
+        async def build_payload():
+            started = profiler.start()
+            cursor = db[ROLLUP_COLLECTION_NAME].find(query, {"_id": 0, "ticker": 0}).sort("date", 1)
+            days = [
+                {
+                    "date": day["date"],
+                    "count": day["count"],
+                    "averageSentiment": day["sentimentSum"] / day["count"],
+                    "averageConfidence": day["confidenceSum"] / day["count"],
+                }
+                async for day in cursor
+                if day["count"]
+            ]
+            record_mongo("daily_sentiment", db[ROLLUP_COLLECTION_NAME], started)
+            profiler.record("daily_sentiment", db[ROLLUP_COLLECTION_NAME], query, started, [("date", 1)])
+            logger.debug("Retrieved %d days for %s", len(days), stock_ticker.upper())
+            return {"ticker": stock_ticker.upper(), "days": days}
+
+        key = ("daily", stock_ticker.upper(), start, end)
+        return await cached_json_response(request, db, key, build_payload)
+    except Exception as e:
+        logger.exception("Error fetching daily sentiment")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Response cache size and hit-rate counters."""
+    return response_cache.stats()
+
+@app.post("/cache/invalidate", dependencies=[Depends(require_admin)])
+async def invalidate_cache():
+    """Drop every cached response (ingest runs do this automatically through ingestStatus)."""
+    response_cache.invalidate()
+    return response_cache.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Route latency and MongoDB call histograms plus response cache counters, in the Prometheus text format."""
+    stats = response_cache.stats()
+    counters = [
+        ("response_cache_hits_total", "Response cache hits", stats["hits"]),
+        ("response_cache_misses_total", "Response cache misses", stats["misses"]),
+        ("response_cache_evictions_total", "Response cache LRU evictions", stats["evictions"]),
+        ("response_cache_invalidations_total", "Response cache invalidations", stats["invalidations"]),
+        ("response_cache_entries", "Responses currently cached", stats["entries"]),
+    ]
+    return Response(metrics.render(counters), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/queries", dependencies=[Depends(require_debug_queries), Depends(require_admin)])
+async def get_query_profile():
+    """Recent query timings, documents examined and plans (needs QUERY_PROFILING=1 and DEBUG_QUERIES=1)."""
+    return profiler.report()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
 
@@ -0,0 +1,151 @@
+import time
+import json
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from a cached response to a slow full scan
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+def format_labels(labels):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped))
+
+class MetricsRegistry:
+    """Latency histograms and counters for the API, rendered in the Prometheus text format.
+
+    Everything runs on the event loop, so no locking is needed. Label values
+    must come from a small fixed set (route templates, not raw paths) to keep
+    the number of series bounded.
+    """
+
+    def __init__(self):
+        self.histograms = {}  # name -> {labels: Histogram}
+        self.help = {}
+
+    def observe(self, name, labels, seconds, help_text=""):
+        series = self.histograms.setdefault(name, {})
+        self.help.setdefault(name, help_text)
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(seconds)
+
+    def render(self, counters=()):
+        """Prometheus text exposition; counters is an iterable of (name, help, value) added as-is."""
+        lines = []
+        for name, series in self.histograms.items():
+            lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series.items():
+                for bound, total in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{{format_labels(labels + (("le", bound),))}}} {total}')
+                lines.append(f'{name}_bucket{{{format_labels(labels + (("le", "+Inf"),))}}} {histogram.count}')
+                lines.append(f"{name}_sum{{{format_labels(labels)}}} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{{{format_labels(labels)}}} {histogram.count}")
+        for name, help_text, value in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+class RouteLatencyMiddleware:
+    """ASGI middleware recording each HTTP request's latency by method, route template and status.
+
+    It wraps send() instead of using BaseHTTPMiddleware, so no extra task is
+    created per request, and streamed responses are timed until their last
+    chunk is sent. Requests that match no route are grouped as "unmatched".
+    """
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "unmatched"), "status": status}
+            self.registry.observe("http_request_duration_seconds", labels, time.perf_counter() - started, "HTTP request latency by route")
+
+class StageTimer:
+    """Per-stage wall time, call and item counts for an ingest run.
+
+    Use time(stage, items) as a context manager around each piece of work;
+    summary() returns everything as a JSON-friendly dict for the end of the run.
+    Stages that overlap (scoring and writing run concurrently in mongoInsert2)
+    each report their own busy time, so stage times can add up to more than
+    the run's elapsed time.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds, items=0):
+        totals = self.stages.setdefault(stage, {"calls": 0, "items": 0, "seconds": 0.0})
+        totals["calls"] += 1
+        totals["items"] += items
+        totals["seconds"] += seconds
+
+    @contextmanager
+    def time(self, stage, items=0):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started, items)
+
+    def summary(self, **counters):
+        stages = {}
+        for stage, totals in self.stages.items():
+            stages[stage] = {
+                "calls": totals["calls"],
+                "items": totals["items"],
+                "seconds": round(totals["seconds"], 3),
+                "itemsPerSecond": round(totals["items"] / totals["seconds"], 1) if totals["seconds"] and totals["items"] else None,
+            }
+        return {"elapsedSeconds": round(time.perf_counter() - self.started, 3), "stages": stages, "counters": counters}
+
+    def write_summary(self, path, **counters):
+        """Writes summary() to path as JSON and returns it."""
+        summary = self.summary(**counters)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
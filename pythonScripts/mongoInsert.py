@@ -1,43 +1,66 @@
 import os
-import pandas as pd
+import json
 import ast
 import time
 import asyncio
 from tqdm import tqdm
 from dotenv import load_dotenv
-from transformers import pipeline, AutoTokenizer
-from motor.motor_asyncio import AsyncIOMotorClient
+from lazyResources import get_database, get_model, get_sentiment_cache, get_tokenizer
+from sentimentInference import encode_pending_posts, analyze_with_cache
+from rollups import ROLLUP_COLLECTION_NAME, ensure_rollup_index, rebuild_rollups
+from responseCache import mark_ingest_complete
+from bulkWriter import POST_KEY_FIELD, add_post_keys, bulk_upsert, ensure_post_key_index
+from metrics import StageTimer
+from processedPosts import PROCESSED_FILE, postsToScore, readProcessed
 
 # Load environment variables
 load_dotenv()
-MONGO_URI = os.getenv("MONGODB_URI")
-if not MONGO_URI:
-    raise ValueError("❌ MONGO_URI is not set. Check your .env file or environment variables.")
-print(f"✅ Connected to MongoDB at {MONGO_URI}")
 
+# The MongoDB client, tokenizer, model and sentiment cache are created on first use (see lazyResources.py).
 DB_NAME = "sentiment-analysis"
 COLLECTION_NAME = "postsV2"
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
-collection = db[COLLECTION_NAME]
 
-# Initialize sentiment analysis pipeline
+# Sentiment analysis model
 MODEL_NAME = "yiyanghkust/finbert-tone"
-print("⏳ Loading sentiment analysis model...")
-sentimentAnalyzer = pipeline("sentiment-analysis", model=MODEL_NAME)
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-print("✅ Model loaded successfully!")
+# One of inferenceBackends.BACKENDS; run parityCheck.py before switching to a quantized one.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
 
-CSV_FILE = "processedWSBposts.csv"
+# Dynamic batching limits for inference (posts per batch and padded tokens per batch)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", "8192"))
+
+# Persistent sentiment cache so unchanged posts are not scored again on re-runs (kept apart per inference backend)
+SENTIMENT_CACHE_FILE = os.getenv("SENTIMENT_CACHE_FILE", "sentimentCache.sqlite")
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "1000000"))
+
+# Per-stage timings and counters of the last run, as JSON
+INGEST_SUMMARY_FILE = os.getenv("INGEST_SUMMARY_FILE", "mongoInsert.summary.json")
+
+def sentiment_cache():
+    from inferenceBackends import results_model_name  # Imports torch, so only once the cache is needed
+    return get_sentiment_cache(results_model_name(MODEL_NAME, INFERENCE_BACKEND), SENTIMENT_CACHE_FILE, SENTIMENT_CACHE_MAX_ENTRIES)
 
 # Function to truncate text in batch
-def filter_valid_posts(df):
-    """Filters out posts that exceed token limits for batch processing"""
+def filter_valid_posts(df, stages):
+    """Filters out posts that exceed token limits for batch processing.
+
+    Cached posts are kept without being tokenized again. The remaining
+    distinct posts are encoded once and returned so the same encodings can be
+    used as model input. Returns the filtered DataFrame, the cached results
+    and the {post: encoding} dict of posts that still need scoring.
+    """
     print("🔍 Filtering out long posts...")
-    df["valid"] = df["post"].apply(lambda x: len(tokenizer.tokenize(str(x))) <= 510)
-    filtered_df = df[df["valid"]].drop(columns=["valid"])
+    posts = df["scoredPost"].tolist()
+    with stages.time("filter", len(posts)):
+        cached = sentiment_cache().get_many(dict.fromkeys(posts))
+    with stages.time("tokenize", len(posts) - len(cached)):
+        pending = encode_pending_posts(posts, get_tokenizer(MODEL_NAME), cached)
+    with stages.time("filter"):
+        df["valid"] = [post in cached or post in pending for post in posts]
+        filtered_df = df[df["valid"]].drop(columns=["valid"])
     print(f"✅ {len(filtered_df)} valid posts remaining after filtering.")
-    return filtered_df
+    print(f"💾 {len(cached)} cached, {len(pending)} distinct posts to score.")
+    return filtered_df, cached, pending
 
 # Function to safely convert ticker field into a list
 def process_ticker(ticker_data):
@@ -51,31 +74,54 @@ def process_ticker(ticker_data):
     return []
 
 # Function to analyze sentiment in batches
-async def analyze_sentiment_batch(posts):
+async def analyze_sentiment_batch(posts, cached, pending):
     print("⚡ Running sentiment analysis...")
-    results = sentimentAnalyzer(posts)
+    results = analyze_with_cache(
+        posts, cached, pending, sentiment_cache(), get_tokenizer(MODEL_NAME), get_model(MODEL_NAME, INFERENCE_BACKEND),
+        MAX_BATCH_SIZE, MAX_BATCH_TOKENS,
+    )
     print("✅ Sentiment analysis completed!")
     return results
 
 # Function to process and insert posts into MongoDB
 async def process_posts():
     start_time = time.time()
-    sentiment_map = {"Positive": 1, "Neutral": 0, "Negative": -1}
+    sentiment_map = {"positive": 1, "neutral": 0, "negative": -1}
+    stages = StageTimer()
+    counters = {"status": "failed", "rowsLoaded": 0, "validPosts": 0, "cachedPosts": 0, "scoredPosts": 0, "nearDuplicatePosts": 0, "upserted": 0, "matched": 0}
 
     try:
-        print("📂 Loading CSV file...")
-        df = pd.read_csv(CSV_FILE)
-        print(f"✅ Loaded {len(df)} posts from CSV.")
+        db = get_database(DB_NAME)
+        collection = db[COLLECTION_NAME]
+        rollup_collection = db[ROLLUP_COLLECTION_NAME]
+        print(f"✅ Connected to MongoDB ({DB_NAME}.{COLLECTION_NAME})")
+
+        print(f"⏳ Loading sentiment analysis model ({INFERENCE_BACKEND})...")
+        get_model(MODEL_NAME, INFERENCE_BACKEND)
+        print("✅ Model loaded successfully!")
+
+        print(f"📂 Loading {PROCESSED_FILE}...")
+        load_started = time.perf_counter()
+        df = add_post_keys(readProcessed(PROCESSED_FILE))  # Same keys as mongoInsert2, so either script can re-run over the other
+        stages.add("load", time.perf_counter() - load_started, len(df))
+        counters["rowsLoaded"] = len(df)
+        print(f"✅ Loaded {len(df)} posts.")
+
+        # Near-duplicate posts are scored as their cluster's representative (see nearDuplicates.py).
+        df["scoredPost"] = postsToScore(df)
+        counters["nearDuplicatePosts"] = int((df["scoredPost"] != df["post"].astype(str)).sum())
 
         # Filter out long posts
-        df = filter_valid_posts(df)
+        df, cached, pending = filter_valid_posts(df, stages)
+        counters.update(validPosts=len(df), cachedPosts=len(cached), scoredPosts=len(pending))
 
         # Process tickers
         print("🔄 Processing ticker symbols...")
         df["ticker"] = df["symbols"].apply(process_ticker)
 
-        posts = df["post"].astype(str).tolist()
-        sentiment_results = await analyze_sentiment_batch(posts)
+        posts = df["scoredPost"].tolist()
+        with stages.time("infer", len(posts)):
+            sentiment_results = await analyze_sentiment_batch(posts, cached, pending)
 
         # Prepare documents for bulk insertion
         print("🛠️ Preparing documents for MongoDB...")
@@ -83,29 +129,45 @@ async def process_posts():
             {
                 "ticker": ticker,
                 "sentiment": sentiment_map.get(result["label"], 0),
+                "confidence": result["confidence"],
                 "date": date,
                 "preprocessedPost": post,
-                "originalPost": body
+                "originalPost": body,
+                "postKey": post_key
             }
-            for ticker, date, post, body, result in tqdm(
-                zip(df["ticker"], df["date"], df["post"], df["body"], sentiment_results),
+            for ticker, date, post, body, post_key, result in tqdm(
+                zip(df["ticker"], df["date"], df["post"], df["body"], df[POST_KEY_FIELD], sentiment_results),
                 total=len(posts),
                 desc="🔄 Processing Posts"
             )
         ]
         print("✅ Documents prepared.")
 
-        # Batch insert into MongoDB
+        # Batch upsert into MongoDB
         if documents:
-            print("📤 Inserting into MongoDB (batch)...")
-            await collection.insert_many(documents)
+            print("📤 Upserting into MongoDB (batch)...")
+            with stages.time("write", len(documents)):
+                await ensure_post_key_index(collection)
+                result = await bulk_upsert(collection, documents)
+            counters.update(upserted=result.upserted_count, matched=result.matched_count)
+            # Recomputed from every post, so re-scored posts and an earlier run that stopped before this point are counted right.
+            with stages.time("rollup", len(documents)):
+                await ensure_rollup_index(rollup_collection)
+                await rebuild_rollups(collection, rollup_collection)
             print(f"✅ {len(documents)} posts stored successfully in MongoDB!")
 
+        print(f"💾 Sentiment cache: {sentiment_cache().stats()}")
+        await mark_ingest_complete(db)  # Tells the API its cached responses are stale
         elapsed_time = (time.time() - start_time) / 60
         print(f"⏱️ Total elapsed time: {elapsed_time:.2f} minutes")
+        counters["status"] = "completed"
 
     except Exception as e:
         print(f"❌ Error processing CSV: {e}")
+        counters["error"] = str(e)
+
+    summary = stages.write_summary(INGEST_SUMMARY_FILE, **counters)
+    print(json.dumps(summary))
 
 if __name__ == "__main__":
     print("🚀 Starting script...")
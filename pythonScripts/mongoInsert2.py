@@ -1,45 +1,78 @@
 import os
-import pandas as pd
+import json
 import ast
 import time
 import asyncio
-import torch
-import torch.nn.functional as F
 from tqdm import tqdm
 from dotenv import load_dotenv
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-from motor.motor_asyncio import AsyncIOMotorClient
+from lazyResources import get_database, get_model, get_sentiment_cache, get_tokenizer
+from sentimentInference import encode_pending_posts, analyze_with_cache
+from rollups import ROLLUP_COLLECTION_NAME, apply_rollups, ensure_rollup_index, rebuild_rollups
+from responseCache import mark_ingest_complete
+from ingestPipeline import run_pipeline
+from bulkWriter import POST_KEY_FIELD, Checkpoint, add_post_keys, bulk_upsert, ensure_post_key_index, stored_versions
+from processedPosts import PROCESSED_FILE, postsToScore, readProcessed
+from shardedInference import ShardedScorer, submit_ahead
+from metrics import StageTimer
 
 # Load environment variables
 load_dotenv()
-MONGO_URI = os.getenv("MONGODB_URI")
-if not MONGO_URI:
-    raise ValueError("❌ MONGO_URI is not set. Check your .env file or environment variables.")
-print(f"✅ Connected to MongoDB at {MONGO_URI}")
 
+# The MongoDB client, tokenizer, model and sentiment cache are created on first use (see lazyResources.py),
+# so importing this script, as the worker processes do, is fast and connects to nothing.
 DB_NAME = "sentiment-analysis"
 COLLECTION_NAME = "postsV2"
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
-collection = db[COLLECTION_NAME]
 
-# Initialize sentiment analysis pipeline
+# Sentiment analysis model
 MODEL_NAME = "yiyanghkust/finbert-tone"
-print("⏳ Loading sentiment analysis model...")
+# One of inferenceBackends.BACKENDS; run parityCheck.py before switching to a quantized one.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
 #sentimentAnalyzer = pipeline("sentiment-analysis", model=MODEL_NAME)
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
-print("✅ Model loaded successfully!")
 
-CSV_FILE = "processedWSBposts.csv"
+# Dynamic batching limits for inference (posts per batch and padded tokens per batch)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "64"))
+MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", "8192"))
 
-def filter_valid_posts(df):
-    """Filters out posts that exceed token limits."""
-    print("🔍 Filtering out long posts...")
-    df["valid"] = df["post"].apply(lambda x: len(tokenizer.tokenize(str(x))) <= 510)
-    filtered_df = df[df["valid"]].drop(columns=["valid"])
-    print(f"✅ {len(filtered_df)} valid posts remaining after filtering.")
-    return filtered_df
+# Persistent sentiment cache so unchanged posts are not scored again on re-runs (kept apart per inference backend)
+SENTIMENT_CACHE_FILE = os.getenv("SENTIMENT_CACHE_FILE", "sentimentCache.sqlite")
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "1000000"))
+
+# Pipelined ingest: rows scored and bulk written per chunk, chunks buffered between inference and writes, and concurrent writers
+INFERENCE_CHUNK_SIZE = int(os.getenv("INFERENCE_CHUNK_SIZE", "1000"))
+WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", "4"))
+WRITER_TASKS = int(os.getenv("WRITER_TASKS", "2"))
+
+# Progress of the last run, so an interrupted run resumes after the last acknowledged chunk
+CHECKPOINT_FILE = os.getenv("CHECKPOINT_FILE", "mongoInsert2.checkpoint.json")
+
+# Parallel scoring: number of worker processes (0 scores in this process) and torch threads per worker (0 splits the cores evenly)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+THREADS_PER_WORKER = int(os.getenv("THREADS_PER_WORKER", "0"))
+
+# Per-stage timings and counters of the last run, as JSON
+INGEST_SUMMARY_FILE = os.getenv("INGEST_SUMMARY_FILE", "mongoInsert2.summary.json")
+
+def sentiment_cache():
+    from inferenceBackends import results_model_name  # Imports torch, so only once the cache is needed
+    return get_sentiment_cache(results_model_name(MODEL_NAME, INFERENCE_BACKEND), SENTIMENT_CACHE_FILE, SENTIMENT_CACHE_MAX_ENTRIES)
+
+def load_model():
+    print(f"⏳ Loading sentiment analysis model ({INFERENCE_BACKEND})...")
+    get_model(MODEL_NAME, INFERENCE_BACKEND)
+    print("✅ Model loaded successfully!")
+
+def encode_chunk(posts, stages):
+    """Looks up a chunk's posts in the sentiment cache and encodes the distinct ones that still need scoring.
+
+    Only one chunk is encoded at a time, so encodings are released as soon as
+    their chunk is scored instead of being kept for the whole file. Returns the
+    cached results and the {post: encoding} dict of posts within the token limit.
+    """
+    with stages.time("filter", len(posts)):
+        cached = sentiment_cache().get_many(dict.fromkeys(posts))
+    with stages.time("tokenize", len(posts) - len(cached)):
+        pending = encode_pending_posts(posts, get_tokenizer(MODEL_NAME), cached)
+    return cached, pending
 
 def process_ticker(ticker_data):
     if isinstance(ticker_data, list):
@@ -51,51 +84,182 @@ def process_ticker(ticker_data):
             return [ticker_data]
     return []
 
-async def analyze_sentiment(post):
-    inputs = tokenizer(post, return_tensors="pt", truncation=True, padding=True)
-    with torch.no_grad():
-        logits = model(**inputs).logits
+def analyze_sentiment(cached, pending):
+    """Scores a chunk's pending posts, adding their results to cached. Blocking; runs in an executor."""
+    analyze_with_cache(
+        [], cached, pending, sentiment_cache(), get_tokenizer(MODEL_NAME), get_model(MODEL_NAME, INFERENCE_BACKEND),
+        MAX_BATCH_SIZE, MAX_BATCH_TOKENS,
+    )
+    return cached
+
+def collect_shard(posts, cached, shard, submitted):
+    """Waits for a chunk's shard from the worker processes and adds its results to cached.
 
-    probs = F.softmax(logits, dim=1)
-    labels = ["neutral", "positive", "negative"]
-    predictedClass = torch.argmax(probs, dim=1).item()
-    predictedSentiment = labels[predictedClass]
-    predictedConfidence = probs[0, predictedClass].item()
+    Posts the chunk left to an earlier shard (see submit_chunk) are read back
+    from the sentiment cache, which that shard was stored in when collected.
+    """
+    scored = shard.result()
+    sentiment_cache().put_many(scored.items())
+    submitted.difference_update(shard.posts)
+    cached.update(scored)
+    earlier = [post for post in dict.fromkeys(posts) if post not in cached and post not in scored]
+    if earlier:
+        cached.update(sentiment_cache().get_many(earlier))
+    return cached
 
-    return {"label": predictedSentiment, "confidence": predictedConfidence}
+def build_documents(chunk, sentiment_results):
+    """Builds the MongoDB documents for a chunk of rows and their sentiment results."""
+    sentiment_map = {"positive": 1, "neutral": 0, "negative": -1}
+    return [
+        {
+            "ticker": ticker,
+            "sentiment": sentiment_map.get(sentiment_result["label"], 0),
+            "confidence": sentiment_result["confidence"],
+            "date": date,
+            "preprocessedPost": post,
+            "originalPost": body,
+            "postKey": post_key
+        }
+        for ticker, date, post, body, post_key, sentiment_result in zip(
+            chunk["ticker"], chunk["date"], chunk["post"], chunk["body"], chunk["postKey"], sentiment_results
+        )
+    ]
 
 async def process_posts():
     start_time = time.time()
-    sentiment_map = {"positive": 1, "neutral": 0, "negative": -1}
-    
+    stages = StageTimer()
+    counters = {"status": "failed", "rowsLoaded": 0, "validPosts": 0, "cachedPosts": 0, "scoredPosts": 0, "nearDuplicatePosts": 0, "upserted": 0, "matched": 0}
+
     try:
-        print("📂 Loading CSV file...")
-        df = pd.read_csv(CSV_FILE)
-        print(f"✅ Loaded {len(df)} posts from CSV.")
+        db = get_database(DB_NAME)
+        collection = db[COLLECTION_NAME]
+        rollup_collection = db[ROLLUP_COLLECTION_NAME]
+        print(f"✅ Connected to MongoDB ({DB_NAME}.{COLLECTION_NAME})")
 
-        df = filter_valid_posts(df)
+        print(f"📂 Loading {PROCESSED_FILE}...")
+        load_started = time.perf_counter()
+        checkpoint = Checkpoint(CHECKPOINT_FILE, PROCESSED_FILE)
+        resumed = checkpoint.last_row >= 0
+        if resumed:
+            # Posts without an id are keyed by counting repeated (date, body) pairs over the whole file, so keys
+            # come from those columns of every row; the rest is only read from the row groups after the checkpoint.
+            post_keys = add_post_keys(readProcessed(PROCESSED_FILE, columns=["id", "date", "body"]))[POST_KEY_FIELD]
+            df = readProcessed(PROCESSED_FILE, startRow=checkpoint.last_row + 1)
+            df[POST_KEY_FIELD] = post_keys
+            print(f"⏩ Resuming after row {checkpoint.last_row}, {len(df)} posts left.")
+        else:
+            df = add_post_keys(readProcessed(PROCESSED_FILE))
+        stages.add("load", time.perf_counter() - load_started, len(df))
+        counters["rowsLoaded"] = len(df)
+        print(f"✅ Loaded {len(df)} posts.")
+
+        # Near-duplicate posts are scored as their cluster's representative (see nearDuplicates.py).
+        df["scoredPost"] = postsToScore(df)
+        counters["nearDuplicatePosts"] = int((df["scoredPost"] != df["post"].astype(str)).sum())
+
+        await ensure_post_key_index(collection)
+        await ensure_rollup_index(rollup_collection)
         print("🔄 Processing ticker symbols...")
         df["ticker"] = df["symbols"].apply(process_ticker)
 
-        print("🛠️ Processing and inserting documents...")
-        for _, row in tqdm(df.iterrows(), total=len(df), desc="🔄 Inserting Posts"):
-            sentiment_result = await analyze_sentiment(str(row["post"]))
-            document = {
-                "ticker": row["ticker"],
-                "sentiment": sentiment_map.get(sentiment_result["label"], 0),
-                "confidence": sentiment_result["confidence"],
-                "date": row["date"],
-                "preprocessedPost": row["post"],
-                "originalPost": row["body"]
-            }
-            await collection.insert_one(document)
-        
+        print("🛠️ Scoring and inserting documents...")
+        chunks = enumerate(df.iloc[i:i + INFERENCE_CHUNK_SIZE] for i in range(0, len(df), INFERENCE_CHUNK_SIZE))
+        scorer = None
+        if INFERENCE_WORKERS:
+            # Each chunk's distinct unscored posts become one shard; shards are submitted ahead so every worker stays busy,
+            # and are collected in chunk order, so each post is scored once and all writes stay in this process.
+            scoring = tqdm(desc="🧠 Scoring Posts")
+            scorer = ShardedScorer(MODEL_NAME, INFERENCE_BACKEND, INFERENCE_WORKERS, THREADS_PER_WORKER or None,
+                                   MAX_BATCH_SIZE, MAX_BATCH_TOKENS, on_scored=scoring.update)
+            print(f"🧵 Scoring with {scorer.workers} worker processes, {scorer.threads} torch threads each.")
+
+            # The workers tokenize and length-filter the posts themselves, so this process only looks them up in the cache.
+            # A post already sent in a shard that hasn't been collected yet isn't sent again.
+            submitted = set()
+
+            def submit_chunk(numbered_chunk):
+                posts = dict.fromkeys(numbered_chunk[1]["scoredPost"])
+                with stages.time("filter", len(posts)):
+                    cached = sentiment_cache().get_many(posts)
+                to_score = [post for post in posts if post not in cached and post not in submitted]
+                submitted.update(to_score)
+                return cached, scorer.submit(to_score)
+
+            chunks = submit_ahead(chunks, submit_chunk, 2 * INFERENCE_WORKERS)
+        else:
+            load_model()
+            chunks = ((numbered_chunk, None) for numbered_chunk in chunks)
+        print("🔍 Long posts are filtered out chunk by chunk.")
+        progress = tqdm(total=len(df), desc="🔄 Inserting Posts")
+
+        def score_chunk(item):
+            (chunk_id, chunk), shard = item
+            checkpoint.register(chunk_id, int(chunk.index[-1]))
+            posts = chunk["scoredPost"].tolist()
+            if shard is None:
+                cached, pending = encode_chunk(posts, stages)
+                counters["cachedPosts"] += len(cached)
+                counters["scoredPosts"] += len(pending)
+                with stages.time("infer", len(pending)):
+                    results = analyze_sentiment(cached, pending)
+            else:
+                cached, shard = shard
+                counters["cachedPosts"] += len(cached)
+                # With worker processes this is the time spent waiting for the chunk's shard.
+                with stages.time("infer", len(shard.posts)):
+                    results = collect_shard(posts, cached, shard, submitted)
+                counters["scoredPosts"] += len(shard.result())  # Without the long posts the workers left out
+            with stages.time("build", len(posts)):
+                # Posts over the token limit have no result and are left out.
+                valid = [post in results for post in posts]
+                chunk = chunk[valid]
+                counters["validPosts"] += len(chunk)
+                return chunk_id, build_documents(chunk, [results[post] for post in chunk["scoredPost"]]), len(posts)
+
+        async def write_chunk(scored_chunk):
+            chunk_id, documents, rows = scored_chunk
+            if not documents:
+                checkpoint.acknowledge(chunk_id)
+                progress.update(rows)
+                return
+            with stages.time("write", len(documents)):
+                previous = await stored_versions(collection, documents)
+                result = await bulk_upsert(collection, documents)
+            counters["upserted"] += result.upserted_count
+            counters["matched"] += result.matched_count
+            # Posts already in the collection only change the daily rollups by the difference in their scores.
+            with stages.time("rollup", len(documents)):
+                await apply_rollups(rollup_collection, documents, previous)
+            checkpoint.acknowledge(chunk_id)
+            progress.update(rows)
+
+        try:
+            await run_pipeline(chunks, score_chunk, write_chunk, WRITE_QUEUE_SIZE, WRITER_TASKS)
+        finally:
+            if scorer is not None:
+                scorer.close()
+                scoring.close()
+        progress.close()
+        if resumed:
+            # The interrupted run may have written posts it never added to the rollups.
+            print("🧮 Rebuilding the daily rollups...")
+            with stages.time("rollup"):
+                await rebuild_rollups(collection, rollup_collection)
+        checkpoint.clear()
+
+        print(f"💾 Sentiment cache: {sentiment_cache().stats()}")
+        await mark_ingest_complete(db)  # Tells the API its cached responses are stale
         elapsed_time = (time.time() - start_time) / 60
         print(f"✅ All posts stored successfully in MongoDB!")
         print(f"⏱️ Total elapsed time: {elapsed_time:.2f} minutes")
+        counters["status"] = "completed"
 
     except Exception as e:
         print(f"❌ Error processing CSV: {e}")
+        counters["error"] = str(e)
+
+    summary = stages.write_summary(INGEST_SUMMARY_FILE, **counters)
+    print(json.dumps(summary))
 
 if __name__ == "__main__":
     print("🚀 Starting script...")
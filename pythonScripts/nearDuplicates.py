@@ -0,0 +1,117 @@
+import zlib
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Near-duplicate detection for normalized posts (copy-pasta and lightly edited reposts) with MinHash and LSH.
+# Each cluster is represented by the first post that started it, and a post only joins a cluster when it is
+# similar enough to that representative, so sentiment is only reused between posts estimated to be that similar
+# (clusters don't chain from one lightly edited repost to the next).
+
+# The MinHash permutations use multiply-shift hashing: the high 32 bits of (a * x + b) mod 2**64.
+hashShift = np.uint64(32)
+
+# Splits a post into its word n-grams. Posts shorter than one n-gram are a single shingle.
+def shingles(post, shingleSize):
+    words = post.split()
+    if len(words) <= shingleSize:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + shingleSize]) for i in range(len(words) - shingleSize + 1)}
+
+# Fixed-size key for a post, so remembering every distinct post doesn't keep its whole text.
+def postDigest(post):
+    return hashlib.blake2b(post.encode("utf-8"), digest_size=16).digest()
+
+# Picks how to split the signature into LSH bands: the most rows per band (fewest false candidates)
+# that still makes two posts at exactly the threshold candidates at least 95% of the time.
+def lshBands(numPerm, threshold, recall=0.95):
+    for rows in range(numPerm, 0, -1):
+        if numPerm % rows == 0 and 1 - (1 - threshold ** rows) ** (numPerm // rows) >= recall:
+            return numPerm // rows, rows
+    return numPerm, 1
+
+class NearDuplicateIndex:
+    """Assigns each post to a cluster of near-duplicates, across as many chunks as it is given.
+
+    Posts are similar when the estimated Jaccard similarity of their word
+    shingles is at least threshold. Signatures and LSH buckets are only kept
+    for representatives; every other distinct post just keeps its cluster
+    id under a 16-byte digest of its text. Hashing doesn't depend on the Python hash seed, so the same posts
+    always give the same clusters.
+    """
+
+    def __init__(self, threshold=0.8, numPerm=64, shingleSize=3, seed=1):
+        self.threshold = threshold
+        self.numPerm = numPerm
+        self.shingleSize = shingleSize
+        self.bands, self.rows = lshBands(numPerm, threshold)
+        generator = np.random.default_rng(seed)
+        self.a = generator.integers(1, 1 << 63, size=numPerm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)  # Odd
+        self.b = generator.integers(0, 1 << 63, size=numPerm, dtype=np.uint64) * np.uint64(2)
+        self.bandMultipliers = generator.integers(1, 1 << 63, size=self.rows, dtype=np.uint64)
+        self.buckets = [{} for _ in range(self.bands)]  # per band: band hash -> cluster ids
+        self.representativeSignatures = []  # cluster id -> representative's signature
+        self.representatives = []  # cluster id -> representative post
+        self.clusterOf = {}  # postDigest(post) -> cluster id, for every distinct post seen
+        self.postCount = 0
+
+    # MinHash signatures of a list of posts, computed for all of their shingles at once.
+    def signatures(self, posts):
+        shingleSets = [shingles(post, self.shingleSize) for post in posts]
+        counts = np.fromiter(map(len, shingleSets), dtype=np.int64, count=len(shingleSets))
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingleSet in shingleSets for shingle in shingleSet),
+                             dtype=np.uint64, count=int(counts.sum()))
+        values = (hashes[:, None] * self.a + self.b) >> hashShift
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        return np.minimum.reduceat(values, starts, axis=0).astype(np.uint32)
+
+    # One hash per LSH band of each signature. Two bands that collide only add a candidate that is then checked.
+    def bandHashes(self, signatures):
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        return (bands * self.bandMultipliers).sum(axis=2)
+
+    # Puts a new post in the most similar cluster, or starts a new one with the post as its representative.
+    def add(self, post, digest, signature, bandHashes):
+        candidates = {cluster for buckets, key in zip(self.buckets, bandHashes) for cluster in buckets.get(key, ())}
+        best, bestSimilarity = None, self.threshold
+        for candidate in candidates:
+            similarity = np.count_nonzero(self.representativeSignatures[candidate] == signature) / self.numPerm
+            if similarity >= bestSimilarity:
+                best, bestSimilarity = candidate, similarity
+        if best is None:
+            best = len(self.representatives)
+            self.representativeSignatures.append(signature)
+            self.representatives.append(post)
+            for buckets, key in zip(self.buckets, bandHashes):
+                buckets.setdefault(key, []).append(best)
+        self.clusterOf[digest] = best
+
+    # Clusters a Series of posts. Returns each post's representative and whether the row is the
+    # first one seen of its cluster, both as Series aligned with posts.
+    def assign(self, posts, batchSize=1000):
+        posts = posts.astype(str)
+        clustersBefore = len(self.representatives)
+        digests = {post: postDigest(post) for post in pd.unique(posts)}
+        newPosts = [post for post, digest in digests.items() if digest not in self.clusterOf]
+        # Signatures are computed a batch at a time to bound the size of the shingle x permutation matrix.
+        for start in range(0, len(newPosts), batchSize):
+            batch = newPosts[start:start + batchSize]
+            signatures = self.signatures(batch)
+            for post, signature, bandHashes in zip(batch, signatures, self.bandHashes(signatures).tolist()):
+                self.add(post, digests[post], signature, bandHashes)
+        clusters = posts.map({post: self.clusterOf[digest] for post, digest in digests.items()})
+        representatives = clusters.map(self.representatives.__getitem__)
+        isFirst = (clusters >= clustersBefore) & ~clusters.duplicated()
+        self.postCount += len(posts)
+        return representatives, isFirst
+
+    def stats(self):
+        distinctPosts = len(self.clusterOf)
+        clusters = len(self.representatives)
+        return {
+            "posts": self.postCount,
+            "distinctPosts": distinctPosts,
+            "clusters": clusters,
+            "nearDuplicatePosts": distinctPosts - clusters,  # Distinct posts that reuse another post's sentiment
+            "inferenceAvoided": round(1 - clusters / distinctPosts, 4) if distinctPosts else 0.0,
+        }
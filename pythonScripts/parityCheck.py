@@ -0,0 +1,58 @@
+import time
+import json
+import argparse
+from transformers import AutoTokenizer
+from inferenceBackends import BACKENDS, load_backend
+from sentimentInference import MAX_POST_TOKENS, encode_posts, post_token_count, analyze_sentiment_batch
+from processedPosts import PROCESSED_FILE, readProcessed
+
+MODEL_NAME = "yiyanghkust/finbert-tone"
+
+def load_sample(processed_file, tokenizer, sample_size, seed):
+    """Random sample of processed posts that fit in the model without truncation."""
+    posts = readProcessed(processed_file, columns=["post"])["post"].dropna().astype(str)
+    posts = posts.sample(n=min(sample_size, len(posts)), random_state=seed).tolist()
+    features = encode_posts(posts, tokenizer, truncation=False)
+    return [post for post, feature in zip(posts, features) if post_token_count(feature, tokenizer) <= MAX_POST_TOKENS]
+
+def score(model, tokenizer, posts):
+    started = time.perf_counter()
+    results = analyze_sentiment_batch(posts, tokenizer, model)
+    return results, time.perf_counter() - started
+
+def compare(baseline, results):
+    """Label agreement and confidence drift of results against the fp32 baseline."""
+    agreement = sum(b["label"] == r["label"] for b, r in zip(baseline, results)) / len(baseline)
+    drift = [abs(b["confidence"] - r["confidence"]) for b, r in zip(baseline, results)]
+    drift.sort()
+    return {
+        "labelAgreement": round(agreement, 4),
+        "meanConfidenceDrift": round(sum(drift) / len(drift), 5),
+        "p95ConfidenceDrift": round(drift[int(0.95 * (len(drift) - 1))], 5),
+        "maxConfidenceDrift": round(drift[-1], 5),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare inference backends against the fp32 torch model.")
+    parser.add_argument("--input", "--csv", default=PROCESSED_FILE, help="Processed posts file (Parquet or csv).")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--sample", type=int, default=1000, help="Number of posts to sample from the input.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", nargs="+", default=[backend for backend in BACKENDS if backend != "torch"])
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    posts = load_sample(args.input, tokenizer, args.sample, args.seed)
+    print(f"📂 Scoring {len(posts)} sampled posts with each backend...")
+
+    baseline, baseline_seconds = score(load_backend("torch", args.model, tokenizer), tokenizer, posts)
+    report = {"posts": len(posts), "torch": {"postsPerSecond": round(len(posts) / baseline_seconds, 1)}}
+    for backend in args.backends:
+        results, seconds = score(load_backend(backend, args.model, tokenizer), tokenizer, posts)
+        report[backend] = {
+            "postsPerSecond": round(len(posts) / seconds, 1),
+            "speedup": round(baseline_seconds / seconds, 2),
+            **compare(baseline, results),
+        }
+
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,77 @@
+import re
+import ahocorasick
+import numpy as np
+import pandas as pd
+from textNormalizer import normalizePosts
+
+# Thread templates and bot replies that are very common on r/WallStreetBets and say nothing about a stock,
+# as (literal text the pattern starts with, pattern). One Aho-Corasick scan over all the posts finds every
+# literal, and only where one is found is the post checked against that template's pattern.
+templateRules = {
+    "dailyDiscussionThread": ("Your daily trading discussion thread", "Your daily trading discussion thread."),
+    "dailyHypeThread": ("Your daily hype thread", "Your daily hype thread."),
+    "weekendDiscussionThread": ("Your weekend discussion thread", "Your weekend discussion thread."),
+    "welcomePost": ("Welcome to WSB", "Welcome to WSB"),
+    "inductionsPost": ("Inductions\n", r"Inductions\n"),
+    "yachtClubThread": ("This is an old Yacht Club thread", "This is an old Yacht Club thread"),
+    "processingImage": ("*Processing img", r"\*Processing img"),
+    "betBotReply": ("You already have a bet", "You already have a bet"),
+}
+
+# Posts joined into one string per template scan, which bounds the extra memory the scan needs.
+scanBlockRows = 10_000
+
+# Builds the automaton over every template's literal text once, when the module is imported.
+def buildTemplateAutomaton():
+    automaton = ahocorasick.Automaton()
+    for rule, (literal, pattern) in templateRules.items():
+        automaton.add_word(literal, (rule, len(literal), re.compile(pattern)))
+    automaton.make_automaton()
+    return automaton
+
+templateAutomaton = buildTemplateAutomaton()
+
+# Every rule a post can be rejected by, in the order they are checked. A rejected post is only counted
+# under the first rule it fails (for templates, the one that ends earliest in the post).
+rules = ["missingBody", *templateRules, "singleWord", "tooFewWords", "mostlyNumbers"]
+
+# Finds the template each post matches (or None) with one scan over a block of posts at a time.
+# Each match is checked against the post it starts in, so a literal running into the next post never counts.
+def templateRulesFor(bodies):
+    failed = [None] * len(bodies)
+    for blockStart in range(0, len(bodies), scanBlockRows):
+        block = bodies[blockStart:blockStart + scanBlockRows]
+        starts = np.cumsum([0] + [len(body) + 1 for body in block[:-1]])
+        for endIndex, (rule, length, pattern) in templateAutomaton.iter("\n".join(block)):
+            position = endIndex - length + 1
+            row = int(starts.searchsorted(position, side="right")) - 1
+            if failed[blockStart + row] is None and pattern.match(block[row], position - starts[row]):
+                failed[blockStart + row] = rule
+    return failed
+
+# Checks a normalized post from a single split: it needs 2 or more words, no more than 25% of them numbers.
+def qualityRule(post):
+    words = post.split()
+    if len(words) <= 1:
+        return "tooFewWords"
+    if 4 * sum(map(str.isdigit, words)) > len(words):
+        return "mostlyNumbers"
+    return None
+
+# Runs every boilerplate and quality rule over a Series of original posts, normalizing only the posts
+# that pass the boilerplate rules. Returns the keep mask aligned with bodies, the normalized kept posts,
+# and the number of posts rejected by each rule.
+def filterPosts(bodies):
+    present = bodies.notna()
+    texts = bodies[present].astype(str).tolist()
+    failed = pd.Series("missingBody", index=bodies.index, dtype=object)
+    failed[present] = [
+        rule if rule is not None else ("singleWord" if " " not in text else None)
+        for rule, text in zip(templateRulesFor(texts), texts)
+    ]
+    passed = failed.isna()
+    posts = normalizePosts(bodies[passed])
+    failed[passed] = [qualityRule(post) for post in posts]
+    keep = failed.isna()
+    rejections = failed[~keep].value_counts()
+    return keep, posts[keep[passed]], {rule: int(rejections.get(rule, 0)) for rule in rules}
@@ -0,0 +1,233 @@
+import os
+import shutil
+from contextlib import contextmanager
+import pandas as pd
+
+# The processed posts handed from PreProcessing.py to the ingest scripts. Parquet keeps the date as a
+# date and the symbols as a list column, so nothing has to be parsed back out of strings, and readers
+# can load only the columns and row groups they need. CSV is still available with --format csv.
+PROCESSED_FILES = {"parquet": "processedWSBposts.parquet", "csv": "processedWSBposts.csv"}
+PROCESSED_FILE = os.getenv("PROCESSED_FILE", PROCESSED_FILES["parquet"])
+# 'id' is the Reddit post id, which the ingest scripts key documents on (see bulkWriter.add_post_keys).
+# 'body' keeps the original post. 'representative' is the post a near-duplicate is scored as (see nearDuplicates.py),
+# and is empty when a post is scored as itself.
+columns = ["id", "date", "body", "post", "symbols", "representative"]
+
+# Rows per Parquet row group. Smaller groups let a resumed ingest skip more of the file.
+ROW_GROUP_SIZE = 50_000
+
+# pyarrow is only needed for Parquet, so it is imported when a Parquet file is first used.
+def parquetSchema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.string()),
+        ("date", pa.date32()),
+        ("body", pa.string()),
+        ("post", pa.string()),
+        ("symbols", pa.list_(pa.string())),
+        ("representative", pa.string()),
+    ])
+
+# Picks the format from the file extension.
+def fileFormat(path):
+    return "parquet" if path.endswith(".parquet") else "csv"
+
+# Parquet output is a directory of part files, read in name order. Each run that writes to it adds one part
+# (a full run first replaces the whole directory), so an incremental run only writes its new rows.
+PART_PATTERN = "part-{:05d}.parquet"
+
+# The part files of a Parquet output in order. A single Parquet file written before outputs were split
+# into parts is read as the only part.
+def parquetParts(path):
+    if os.path.isfile(path):
+        return [path]
+    if not os.path.isdir(path):
+        return []
+    names = sorted(name for name in os.listdir(path) if name.startswith("part-") and name.endswith(".parquet"))
+    return [os.path.join(path, name) for name in names]
+
+# The columns a processed output was written with (outputs from before a column was added don't have it).
+def outputColumns(path):
+    if fileFormat(path) == "csv":
+        return list(pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns)
+    import pyarrow.parquet as pq
+    parts = parquetParts(path)
+    return pq.read_schema(parts[0]).names if parts else []
+
+# Where a processed output ends: its size in bytes for CSV, or its number of parts and rows for Parquet.
+def outputPosition(path):
+    if fileFormat(path) == "csv":
+        return {"outputBytes": os.path.getsize(path)}
+    import pyarrow.parquet as pq
+    parts = parquetParts(path)
+    return {"outputParts": len(parts), "outputRows": sum(pq.ParquetFile(part).metadata.num_rows for part in parts)}
+
+# Appends processed chunks to a CSV file. With keep, the file is first cut back to keep["outputBytes"].
+class CsvPostsWriter:
+    def __init__(self, path, keep=None):
+        self.path = path
+        # Opening in append mode at a non-zero offset doesn't write another utf-8-sig BOM.
+        with open(path, "r+b" if keep else "wb") as f:
+            f.truncate(keep["outputBytes"] if keep else 0)
+        self.output = open(path, "a", encoding="utf-8-sig", newline="")
+        self.position = None
+
+    def write(self, data):
+        data.to_csv(self.output, index=False, header=(self.output.tell() == 0))
+
+    def close(self):
+        if self.output.tell() == 0:
+            pd.DataFrame(columns=columns).to_csv(self.output, index=False)
+        self.output.flush()
+        os.fsync(self.output.fileno())
+        self.position = {"outputBytes": self.output.tell()}
+        self.output.close()
+
+    def abort(self):
+        self.output.close()
+
+# Writes processed chunks as one new part of a Parquet output, buffering them into row groups of ROW_GROUP_SIZE rows.
+# With keep, the part is added after the first keep["outputParts"] parts, and any later parts (left by a run that
+# was interrupted before saving its watermark) are removed. Without keep, the output is replaced by a new
+# directory holding just this part. Either way nothing is visible under the final names until close().
+class ParquetPostsWriter:
+    def __init__(self, path, keep=None, rowGroupSize=ROW_GROUP_SIZE):
+        import pyarrow.parquet as pq
+        self.path = path
+        self.keep = keep
+        self.rowGroupSize = rowGroupSize
+        self.schema = parquetSchema()
+        if keep:
+            for part in parquetParts(path)[keep["outputParts"]:]:
+                os.remove(part)
+            self.directory = path
+            self.keptRows = keep["outputRows"]
+            self.partPath = os.path.join(path, PART_PATTERN.format(keep["outputParts"]))
+        else:
+            self.directory = f"{path}.tmp"
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory)
+            self.keptRows = 0
+            self.partPath = os.path.join(self.directory, PART_PATTERN.format(0))
+        self.tempPath = f"{self.partPath}.tmp"
+        self.writer = pq.ParquetWriter(self.tempPath, self.schema, compression="zstd")
+        self.pending = []
+        self.pendingRows = 0
+        self.rows = 0
+        self.position = None
+
+    def write(self, data):
+        if data.empty:
+            return
+        import pyarrow as pa
+        self.append(pa.Table.from_pandas(data[columns], schema=self.schema, preserve_index=False))
+
+    def append(self, table):
+        self.pending.append(table)
+        self.pendingRows += table.num_rows
+        if self.pendingRows >= self.rowGroupSize:
+            self.flush()
+
+    # Writes the buffered rows as full row groups, keeping any remainder buffered unless final is set.
+    def flush(self, final=False):
+        if not self.pending:
+            return
+        import pyarrow as pa
+        table = pa.concat_tables(self.pending)
+        rows = table.num_rows if final else table.num_rows - table.num_rows % self.rowGroupSize
+        self.writer.write_table(table.slice(0, rows), row_group_size=self.rowGroupSize)
+        self.rows += rows
+        self.pending = [table.slice(rows)] if rows < table.num_rows else []
+        self.pendingRows = table.num_rows - rows
+
+    def close(self):
+        self.flush(final=True)
+        self.writer.close()
+        if self.keep and self.rows == 0:
+            os.remove(self.tempPath)  # An incremental run without new rows doesn't add an empty part
+        else:
+            os.replace(self.tempPath, self.partPath)
+        if not self.keep:
+            # A directory can't be renamed over one that has files in it, so the old output is moved aside first.
+            oldPath = f"{self.path}.old"
+            if os.path.lexists(self.path):
+                os.replace(self.path, oldPath)
+            os.replace(self.directory, self.path)
+            if os.path.isdir(oldPath):
+                shutil.rmtree(oldPath)
+            elif os.path.lexists(oldPath):
+                os.remove(oldPath)
+        parts = len(parquetParts(self.path))
+        self.position = {"outputParts": parts, "outputRows": self.keptRows + self.rows}
+
+    def abort(self):
+        self.writer.close()
+        os.remove(self.tempPath)
+        if not self.keep:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+# Opens the writer for the file's format; writer.position is set once the block finishes without an error.
+@contextmanager
+def openWriter(path, keep=None):
+    writer = (ParquetPostsWriter if fileFormat(path) == "parquet" else CsvPostsWriter)(path, keep)
+    try:
+        yield writer
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+# The text each row's sentiment comes from: its cluster representative if it has one, otherwise the post itself.
+# Files written before the representative column existed are scored post by post.
+def postsToScore(data):
+    if "representative" not in data.columns:
+        return data["post"].astype(str)
+    return data["representative"].fillna(data["post"]).astype(str)
+
+# Reads processed posts indexed by their row number in the output, starting at startRow.
+# Requested columns the output was written without come back empty.
+# For Parquet only the requested columns of the row groups holding those rows are read, from memory maps of
+# the parts, and the result has the same types as a CSV read: date as a YYYY-MM-DD string, symbols as Python lists.
+def readProcessed(path, columns=None, startRow=0):
+    missing = []
+    if columns:
+        available = outputColumns(path)
+        missing = [column for column in columns if column not in available]
+    readColumns = [column for column in columns if column not in missing] if columns else None
+    if fileFormat(path) == "csv":
+        data = pd.read_csv(path, usecols=readColumns, dtype={"id": str}).iloc[startRow:]
+        return data.assign(**{column: None for column in missing})[columns or list(data.columns)]
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    tables = []
+    firstRow = None
+    offset = 0
+    for part in parquetParts(path):
+        partFile = pq.ParquetFile(part, memory_map=True)
+        rowGroups = []
+        for rowGroup in range(partFile.metadata.num_row_groups):
+            rows = partFile.metadata.row_group(rowGroup).num_rows
+            if offset + rows > startRow:
+                rowGroups.append(rowGroup)
+                firstRow = offset if firstRow is None else firstRow
+            offset += rows
+        if rowGroups:
+            tables.append(partFile.read_row_groups(rowGroups, columns=readColumns))
+    table = pa.concat_tables(tables) if tables else parquetSchema().empty_table()
+    if columns and not tables:
+        table = table.select(columns)
+
+    order = table.column_names
+    symbols = None
+    if "symbols" in table.column_names:
+        symbols = table.column("symbols").to_pylist()
+        table = table.drop_columns(["symbols"])
+    if "date" in table.column_names:
+        table = table.set_column(table.column_names.index("date"), "date", table.column("date").cast(pa.string()))
+    data = table.to_pandas()
+    if symbols is not None:
+        data["symbols"] = symbols
+    data.index = pd.RangeIndex(firstRow or 0, (firstRow or 0) + len(data))
+    data = data.assign(**{column: None for column in missing if column not in data.columns})
+    return data[data.index >= startRow][columns or order]
@@ -0,0 +1,73 @@
+import time
+import asyncio
+from collections import deque
+from structuredLogging import get_logger
+
+logger = get_logger("queries")
+
+def summarize_plan(stage):
+    """Flatten a winning plan into e.g. 'LIMIT > FETCH > IXSCAN(ticker_1_date_1)'."""
+    stages = []
+    while stage:
+        name = stage.get("stage", "?")
+        if "indexName" in stage:
+            name += f"({stage['indexName']})"
+        stages.append(name)
+        stage = stage.get("inputStage") or (stage.get("inputStages") or [None])[0]
+    return " > ".join(stages)
+
+class QueryProfiler:
+    """Optional per-query instrumentation for the API.
+
+    When enabled, each recorded query is explained in the background with
+    executionStats, so the request itself is not slowed down. The timing,
+    documents and keys examined and the winning plan are kept for the last
+    max_records queries. Queries slower than slow_ms are also logged.
+    """
+
+    def __init__(self, enabled=False, slow_ms=100, max_records=200):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.records = deque(maxlen=max_records)
+        self.pending = set()
+
+    def start(self):
+        return time.perf_counter()
+
+    def record(self, name, collection, query, started, sort=None, limit=None):
+        """Queue an explain of a query that finished; started comes from start()."""
+        if not self.enabled:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        task = asyncio.create_task(self.explain(name, collection, query, sort, limit, elapsed_ms))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def explain(self, name, collection, query, sort, limit, elapsed_ms):
+        try:
+            cursor = collection.find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            plan = await cursor.explain()
+            stats = plan.get("executionStats", {})
+            entry = {
+                "name": name,
+                "collection": collection.name,
+                "query": repr(query),
+                "elapsedMs": round(elapsed_ms, 2),
+                "docsExamined": stats.get("totalDocsExamined"),
+                "keysExamined": stats.get("totalKeysExamined"),
+                "returned": stats.get("nReturned"),
+                "plan": summarize_plan(plan.get("queryPlanner", {}).get("winningPlan", {})),
+            }
+        except Exception as e:
+            entry = {"name": name, "collection": collection.name, "elapsedMs": round(elapsed_ms, 2), "error": str(e)}
+
+        self.records.append(entry)
+        if elapsed_ms >= self.slow_ms:
+            logger.warning("Slow query", extra={"fields": entry})
+
+    def report(self):
+        return {"enabled": self.enabled, "slowMs": self.slow_ms, "queries": list(self.records)}
@@ -0,0 +1,114 @@
+import time
+import hashlib
+from datetime import datetime, timezone
+from collections import OrderedDict
+from email.utils import format_datetime, parsedate_to_datetime
+
+# Ingest runs record their completion here so every API process knows its cached responses are stale.
+INGEST_STATUS_COLLECTION_NAME = "ingestStatus"
+INGEST_STATUS_ID = "posts"
+
+# Data version before ingestStatus has been read for the first time.
+UNCHECKED = object()
+
+async def mark_ingest_complete(db):
+    """Called by the ingest scripts when a run finishes; bumps the data version the API watches."""
+    await db[INGEST_STATUS_COLLECTION_NAME].update_one(
+        {"_id": INGEST_STATUS_ID},
+        {"$set": {"completedAt": datetime.now(timezone.utc)}, "$inc": {"version": 1}},
+        upsert=True,
+    )
+
+async def read_ingest_status(db):
+    return await db[INGEST_STATUS_COLLECTION_NAME].find_one({"_id": INGEST_STATUS_ID})
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "expires_at")
+
+    def __init__(self, body, last_modified, expires_at):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    def headers(self):
+        return {"ETag": self.etag, "Last-Modified": format_datetime(self.last_modified, usegmt=True)}
+
+    def not_modified(self, if_none_match, if_modified_since):
+        """True if the client's validators show it already has this response."""
+        if if_none_match is not None:
+            return self.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if if_modified_since is not None:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+class ResponseCache:
+    """Bounded LRU cache of encoded responses with a time-to-live.
+
+    Entries are evicted least recently used first once max_entries is
+    reached, and expire ttl_seconds after they were stored. The whole cache is
+    dropped by invalidate(), which the API calls when an ingest run completes.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.data_version = UNCHECKED
+        self.data_modified = None
+        self.version_checked_at = 0.0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, body):
+        last_modified = self.data_modified or datetime.now(timezone.utc)
+        entry = CachedResponse(body, last_modified.replace(microsecond=0), time.monotonic() + self.ttl_seconds)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def invalidate(self):
+        self.entries.clear()
+        self.invalidations += 1
+
+    def update_data_version(self, version, modified):
+        """Invalidates the cache if the ingest data version has changed since last seen."""
+        if modified is not None and modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)  # BSON dates come back naive, in UTC
+        if version != self.data_version:
+            if self.data_version is not UNCHECKED:
+                self.invalidate()
+            self.data_version = version
+            self.data_modified = modified
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
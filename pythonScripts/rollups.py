@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+ROLLUP_COLLECTION_NAME = "tickerDailySentiment"
+
+def rollup_increments(documents):
+    """Sums count, sentiment and confidence per (ticker, date) over post documents."""
+    increments = {}
+    for document in documents:
+        for ticker in document["ticker"]:
+            totals = increments.setdefault((ticker, document["date"]), {"count": 0, "sentimentSum": 0, "confidenceSum": 0.0})
+            totals["count"] += 1
+            totals["sentimentSum"] += document["sentiment"]
+            totals["confidenceSum"] += document.get("confidence", 0.0)
+    return increments
+
+async def ensure_rollup_index(rollup_collection):
+    await rollup_collection.create_index([("ticker", 1), ("date", 1)], unique=True)
+
+def rollup_changes(documents, previous=()):
+    """Rollup increments for writing documents over their previous versions.
+
+    previous holds the stored versions of the posts being replaced, so a
+    re-scored post moves its old sentiment out of the sums instead of being
+    counted twice, and a post written again unchanged adds nothing.
+    """
+    increments = rollup_increments(documents)
+    for key, totals in rollup_increments(previous).items():
+        current = increments.setdefault(key, {"count": 0, "sentimentSum": 0, "confidenceSum": 0.0})
+        for field, value in totals.items():
+            current[field] -= value
+    return {key: totals for key, totals in increments.items() if totals["count"] or totals["sentimentSum"] or totals["confidenceSum"]}
+
+async def apply_rollups(rollup_collection, documents, previous=()):
+    """Adds written posts to the daily rollups with one unordered bulk $inc, less their previous versions."""
+    increments = rollup_changes(documents, previous)
+    if not increments:
+        return None
+    operations = [
+        UpdateOne({"ticker": ticker, "date": date}, {"$inc": totals}, upsert=True)
+        for (ticker, date), totals in increments.items()
+    ]
+    return await rollup_collection.bulk_write(operations, ordered=False)
+
+async def rebuild_rollups(posts_collection, rollup_collection):
+    """Recomputes every rollup from the posts collection on the server.
+
+    The ingest scripts call this after a run that stopped between writing
+    posts and updating their rollups. Every rollup is replaced in place and
+    only then are the ones no post maps to any more deleted, so the API never
+    sees the rollups empty.
+    """
+    rebuilt_at = datetime.now(timezone.utc)
+    pipeline = [
+        {"$unwind": "$ticker"},
+        {"$group": {
+            "_id": {"ticker": "$ticker", "date": "$date"},
+            "count": {"$sum": 1},
+            "sentimentSum": {"$sum": "$sentiment"},
+            "confidenceSum": {"$sum": {"$ifNull": ["$confidence", 0]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "ticker": "$_id.ticker",
+            "date": "$_id.date",
+            "count": 1,
+            "sentimentSum": 1,
+            "confidenceSum": 1,
+            "rebuiltAt": {"$literal": rebuilt_at},
+        }},
+        {"$merge": {"into": rollup_collection.name, "on": ["ticker", "date"], "whenMatched": "replace"}},
+    ]
+    await posts_collection.aggregate(pipeline).to_list(length=None)
+    await rollup_collection.delete_many({"rebuiltAt": {"$ne": rebuilt_at}})
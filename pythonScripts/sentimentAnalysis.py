@@ -1,29 +1,23 @@
 # SentimentAnalysisPrototype.py - COMP4990
-from transformers import pipeline
+from functools import lru_cache
 # import matplotlib.pyplot as plt
 import pandas as pd
-import re
+from tickerIndex import extractTickers as findTickers
+from lazyResources import get_ticker_index
 
-# Creates a pipeline or sentiment-analysis and specifies the pretrained model to use.
-sentimentAnalyzer = pipeline("sentiment-analysis", model="yiyanghkust/finbert-tone")
+# Creates a pipeline or sentiment-analysis and specifies the pretrained model to use (on first use, since loading it is slow).
+@lru_cache(maxsize=None)
+def getSentimentAnalyzer():
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model="yiyanghkust/finbert-tone")
 
-# Load the stock tickers csv
-stockTickersCSV = pd.read_csv("company_list.csv")
-
-# Creates our ticker directory
-tickerDirectory = {str(row["Ticker"]).upper(): str(row["Name"]).lower() for _, row in stockTickersCSV.iterrows()}
-
-# Extracts stock tickers from posts
+# Extracts stock tickers from posts, using the ticker index built from company_list.csv (see tickerIndex.py)
 def extractTickers(post):
-    words = re.findall(r'\b[A-Z]{2,5}\b', post.upper())  # Match uppercase words ranging from 2-5 characters (common ticker format)
-    tickersFound = {ticker for ticker in words if ticker in tickerDirectory and ticker}
-
-    # Return the found tickers
-    return list(tickersFound)
+    return findTickers(get_ticker_index("company_list.csv", "Ticker", "company_list.idx"), post)
 
 # Creates a function takes a post and returns the sentiment.
 def analyzeSentiment(post):
-    result = sentimentAnalyzer(post)[0]
+    result = getSentimentAnalyzer()(post)[0]
 
     return result["label"] # Returns the sentiment
 
@@ -39,24 +33,26 @@ redditPosts = [
     {"date": "2025-01-07", "post": "This sucks, NVDA outlook looks grim."}
 ]
 
-# Converts the reddits posts into a dataframe
-df = pd.DataFrame(redditPosts)
-df["date"] = pd.to_datetime(df["date"])
+if __name__ == "__main__":
+    # Converts the reddits posts into a dataframe
+    df = pd.DataFrame(redditPosts)
+    df["date"] = pd.to_datetime(df["date"])
+
+    df["stocks_mentioned"] = df["post"].apply(extractTickers)
 
-df["stocks_mentioned"] = df["post"].apply(extractTickers)
+    # Applys the sentiment analysis to all the posts above
+    df["sentiment"] = df["post"].apply(analyzeSentiment)
 
-# Applys the sentiment analysis to all the posts above
-df["sentiment"] = df["post"].apply(analyzeSentiment)
+    # Extract all found stock tickers into an array
+    stocksFound = sorted(set(df["stocks_mentioned"].dropna().sum()))
 
-# Extract all found stock tickers into an array
-stocksFound = sorted(set(df["stocks_mentioned"].dropna().sum()))
+    # Print results
+    print("Extracted Stock Mentions from Reddit Posts:")
+    print(df[["date", "post", "stocks_mentioned", "sentiment"]])
 
-# Print results
-print("Extracted Stock Mentions from Reddit Posts:")
-print(df[["date", "post", "stocks_mentioned", "sentiment"]])
+    print("\nAll Stock Tickers Found:")
+    print(stocksFound)
 
-print("\nAll Stock Tickers Found:")
-print(stocksFound)
 
 '''
 # Prints the sentiment for each post
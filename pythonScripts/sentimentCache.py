@@ -0,0 +1,112 @@
+import hashlib
+import sqlite3
+import threading
+
+CACHE_FILE = "sentimentCache.sqlite"
+MAX_ENTRIES = 1_000_000
+
+# SQLite limits how many parameters one statement can take, so lookups are done in slices.
+LOOKUP_SLICE = 500
+
+def normalize_post(post):
+    """Collapses whitespace so trivially different copies of a post share a cache entry."""
+    return " ".join(str(post).split())
+
+class SentimentCache:
+    """On-disk cache of sentiment results keyed by a hash of the model name and post text.
+
+    Entries hold the label and confidence. When the cache grows past
+    max_entries, the least recently used entries are evicted. hits and misses
+    count distinct posts looked up since the cache was opened.
+    """
+
+    def __init__(self, model_name, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Scoring may run in an executor thread; callers never use the cache from two threads at once.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # Chunks are looked up and stored from different threads (see mongoInsert2.py).
+        self.lock = threading.RLock()
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment ("
+            "key TEXT PRIMARY KEY, label TEXT NOT NULL, confidence REAL NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS sentiment_last_used ON sentiment (last_used)")
+        self.connection.commit()
+        self.clock = self.connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM sentiment").fetchone()[0]
+
+    def key(self, post):
+        text = f"{self.model_name}\0{normalize_post(post)}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def tick(self):
+        self.clock += 1
+        return self.clock
+
+    def get_many(self, posts):
+        """Looks up posts, returning {post: {"label", "confidence"}} for the ones that are cached."""
+        with self.lock:
+            keys = {}
+            for post in posts:
+                keys.setdefault(self.key(post), []).append(post)
+
+            found = {}
+            key_list = list(keys)
+            for i in range(0, len(key_list), LOOKUP_SLICE):
+                key_slice = key_list[i:i + LOOKUP_SLICE]
+                placeholders = ",".join("?" * len(key_slice))
+                rows = self.connection.execute(
+                    f"SELECT key, label, confidence FROM sentiment WHERE key IN ({placeholders})", key_slice
+                ).fetchall()
+                for key, label, confidence in rows:
+                    for post in keys[key]:
+                        found[post] = {"label": label, "confidence": confidence}
+
+                hit_keys = [row[0] for row in rows]
+                if hit_keys:
+                    now = self.tick()
+                    self.connection.executemany(
+                        "UPDATE sentiment SET last_used = ? WHERE key = ?", [(now, key) for key in hit_keys]
+                    )
+
+            self.connection.commit()
+            hit_count = sum(len(keys[key]) for key in keys if keys[key][0] in found)
+            self.hits += hit_count
+            self.misses += sum(len(posts) for posts in keys.values()) - hit_count
+            return found
+
+    def put_many(self, items):
+        """Stores (post, {"label", "confidence"}) pairs, then evicts down to max_entries."""
+        with self.lock:
+            now = self.tick()
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO sentiment (key, label, confidence, last_used) VALUES (?, ?, ?, ?)",
+                [(self.key(post), result["label"], result["confidence"], now) for post, result in items],
+            )
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            self.connection.execute(
+                "DELETE FROM sentiment WHERE key IN (SELECT key FROM sentiment ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM sentiment").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        self.connection.close()
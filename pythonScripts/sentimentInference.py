@@ -0,0 +1,114 @@
+# Label order of the finbert-tone classification head.
+LABELS = ["neutral", "positive", "negative"]
+
+MAX_BATCH_SIZE = 64
+MAX_BATCH_TOKENS = 8192
+
+# Longest post (in tokens, excluding [CLS] and [SEP]) the model can take without truncation.
+MAX_POST_TOKENS = 510
+
+def encode_posts(posts, tokenizer, truncation=True):
+    """Tokenizes every post in one call to the fast tokenizer.
+
+    Returns one feature dict (input_ids, attention_mask, ...) per post, ready
+    to be padded into a batch.
+    """
+    posts = list(posts)
+    if not posts:  # The tokenizer fails on an empty batch, e.g. when every post of a chunk was cached
+        return []
+    encodings = tokenizer(posts, truncation=truncation)
+    return [
+        {key: encodings[key][i] for key in encodings.keys()}
+        for i in range(len(encodings["input_ids"]))
+    ]
+
+def post_token_count(feature, tokenizer):
+    """Number of tokens in an encoded post, not counting special tokens."""
+    return len(feature["input_ids"]) - tokenizer.num_special_tokens_to_add()
+
+def encode_pending_posts(posts, tokenizer, cached):
+    """Encodes the distinct posts that still need scoring.
+
+    Posts found in cached are skipped and duplicates are collapsed to one
+    entry. Returns {post: feature} for the posts within MAX_POST_TOKENS.
+    """
+    pending = [post for post in dict.fromkeys(posts) if post not in cached]
+    features = encode_posts(pending, tokenizer, truncation=False)
+    return {
+        post: feature
+        for post, feature in zip(pending, features)
+        if post_token_count(feature, tokenizer) <= MAX_POST_TOKENS
+    }
+
+def make_length_batches(lengths, max_batch_size=MAX_BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Groups post indices into batches of similar length.
+
+    Posts are sorted by token count so each batch pads to a length close to
+    its longest member. A batch is closed once it reaches max_batch_size posts
+    or once padding every post to the longest one would exceed max_batch_tokens.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    batch = []
+    for i in order:
+        # Sorted ascending, so the post being added is always the longest in the batch.
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * lengths[i] > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def predict_batch(model, inputs):
+    """Runs one padded batch through the model and returns (label, confidence) per row."""
+    import torch  # Imported on first use; it takes seconds and tokenizing does not need it
+
+    with torch.no_grad():
+        logits = model(**inputs).logits
+
+    probs = torch.softmax(logits, dim=1)
+    confidences, predictedClasses = torch.max(probs, dim=1)
+    return [
+        {"label": LABELS[predictedClass], "confidence": confidence}
+        for predictedClass, confidence in zip(predictedClasses.tolist(), confidences.tolist())
+    ]
+
+def analyze_encoded_batch(features, tokenizer, model, max_batch_size=MAX_BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Scores already encoded posts with length-bucketed dynamic batching.
+
+    Each entry of features is set to None once its batch has been padded, so
+    the encodings are released as inference progresses. Returns one
+    {"label", "confidence"} dict per post, in the same order as features.
+    """
+    lengths = [len(feature["input_ids"]) for feature in features]
+
+    results = [None] * len(features)
+    for batch in make_length_batches(lengths, max_batch_size, max_batch_tokens):
+        inputs = tokenizer.pad([features[i] for i in batch], return_tensors="pt")
+        for i in batch:
+            features[i] = None
+        for i, result in zip(batch, predict_batch(model, inputs)):
+            results[i] = result
+    return results
+
+def analyze_sentiment_batch(posts, tokenizer, model, max_batch_size=MAX_BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Tokenizes and scores a list of posts, returning results in input order."""
+    features = encode_posts(posts, tokenizer)
+    return analyze_encoded_batch(features, tokenizer, model, max_batch_size, max_batch_tokens)
+
+def analyze_with_cache(posts, cached, pending, cache, tokenizer, model, max_batch_size=MAX_BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Scores the pending posts and combines them with the cached results.
+
+    pending ({post: encoding}) is emptied so its encodings can be released as
+    batches are consumed. Newly scored posts are written to cache and added to
+    cached, so later calls reuse them. Returns one result per entry of posts,
+    in order.
+    """
+    pending_posts = list(pending)
+    features = list(pending.values())
+    pending.clear()
+    scored = dict(zip(pending_posts, analyze_encoded_batch(features, tokenizer, model, max_batch_size, max_batch_tokens)))
+    cache.put_many(scored.items())
+    cached.update(scored)
+    return [cached[post] for post in posts]
@@ -0,0 +1,154 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from lazyResources import get_model, get_tokenizer
+from sentimentInference import MAX_BATCH_SIZE, MAX_BATCH_TOKENS, analyze_encoded_batch, encode_pending_posts
+
+MAX_RETRIES = 3
+
+# Model loaded once per worker process by init_worker
+worker_state = {}
+
+def threads_per_worker(workers):
+    """Splits the machine's cores evenly between the worker processes."""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+def init_worker(model_name, backend, threads, max_batch_size, max_batch_tokens):
+    import torch
+
+    # Pinned so workers * threads matches the cores instead of every worker using all of them.
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    worker_state.update(
+        tokenizer=get_tokenizer(model_name),
+        model=get_model(model_name, backend),
+        max_batch_size=max_batch_size,
+        max_batch_tokens=max_batch_tokens,
+    )
+
+def score_shard(posts):
+    """Runs in a worker; returns {post: {"label", "confidence"}} for the shard's posts within MAX_POST_TOKENS.
+
+    Posts are only tokenized here, once, and the same encodings are scored;
+    longer posts are left out of the result.
+    """
+    if not posts:
+        return {}
+    tokenizer = worker_state["tokenizer"]
+    pending = encode_pending_posts(posts, tokenizer, {})
+    results = analyze_encoded_batch(
+        list(pending.values()), tokenizer, worker_state["model"], worker_state["max_batch_size"], worker_state["max_batch_tokens"]
+    )
+    return dict(zip(pending, results))
+
+class Shard:
+    """One submitted list of posts; result() waits for it, resubmitting it if its worker failed."""
+
+    def __init__(self, scorer, posts):
+        self.scorer = scorer
+        self.posts = posts
+        self.attempts = 0
+        self.future = None
+
+    def result(self):
+        while True:
+            future = self.future
+            try:
+                return future.result()
+            except Exception as e:
+                self.scorer.retry(self, future, e)
+
+class ShardedScorer:
+    """Scores shards of posts on a pool of worker processes.
+
+    Each worker loads the model once and limits torch to threads intra-op
+    threads, so workers * threads can be matched to the cores. Shards are submitted without waiting and their results collected
+    in submission order with Shard.result(), so a caller can keep several
+    shards in flight and still merge results in order.
+
+    A worker that raises, or dies and breaks the pool, does not fail the run:
+    the pool is rebuilt if needed and the shards that were in flight are
+    submitted again, up to max_retries times each. on_scored(count) is
+    called from the pool's management thread as each shard finishes, for
+    progress reporting across all workers.
+    """
+
+    def __init__(self, model_name, backend, workers, threads=None, max_batch_size=MAX_BATCH_SIZE,
+                 max_batch_tokens=MAX_BATCH_TOKENS, max_retries=MAX_RETRIES, on_scored=None):
+        self.workers = workers
+        self.threads = threads or threads_per_worker(workers)
+        self.init_args = (model_name, backend, self.threads, max_batch_size, max_batch_tokens)
+        self.max_retries = max_retries
+        self.on_scored = on_scored
+        self.lock = threading.RLock()
+        self.in_flight = set()
+        self.pool = self.start_pool()
+
+    def start_pool(self):
+        # spawn, not fork: torch's thread pools are not safe to use in a forked child.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=self.init_args,
+        )
+
+    def submit(self, posts):
+        shard = Shard(self, posts)
+        with self.lock:
+            self.in_flight.add(shard)
+            self.dispatch(shard)
+        return shard
+
+    def dispatch(self, shard):
+        shard.attempts += 1
+        try:
+            shard.future = self.pool.submit(score_shard, shard.posts)
+        except BrokenProcessPool as e:
+            shard.future = Future()
+            shard.future.set_exception(e)
+        shard.future.add_done_callback(lambda future: self.finished(shard, future))
+
+    def finished(self, shard, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self.lock:
+            self.in_flight.discard(shard)
+        if self.on_scored is not None:
+            self.on_scored(len(shard.posts))
+
+    def retry(self, shard, failed_future, error):
+        with self.lock:
+            if shard.future is not failed_future:
+                return  # Already resubmitted after the pool was rebuilt
+            if shard.attempts > self.max_retries:
+                raise RuntimeError(f"Shard of {len(shard.posts)} posts failed {shard.attempts} times") from error
+            if not isinstance(error, BrokenProcessPool):
+                print(f"⚠️ Worker failed on a shard ({error!r}), retrying...")
+                self.dispatch(shard)
+                return
+
+            # A dead worker breaks the whole pool, so every shard still in flight has to be submitted again.
+            print(f"⚠️ Worker process died, restarting the pool and retrying {len(self.in_flight)} shards...")
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self.start_pool()
+            for pending_shard in self.in_flight:
+                if pending_shard.attempts > self.max_retries:
+                    raise RuntimeError(f"Shard of {len(pending_shard.posts)} posts failed {pending_shard.attempts} times") from error
+                self.dispatch(pending_shard)
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+def submit_ahead(items, submit, depth):
+    """Yields (item, submit(item)) while keeping up to depth items submitted ahead of the consumer."""
+    window = deque()
+    for item in items:
+        window.append((item, submit(item)))
+        if len(window) > depth:
+            yield window.popleft()
+    while window:
+        yield window.popleft()
@@ -0,0 +1,396 @@
+import os
+import json
+import time
+import signal
+import itertools
+import asyncio
+import argparse
+from collections import deque
+import pandas as pd
+from mongoInsert2 import (
+    DB_NAME, COLLECTION_NAME, MODEL_NAME, INFERENCE_BACKEND, MAX_BATCH_SIZE, MAX_BATCH_TOKENS, build_documents, sentiment_cache,
+)
+from PreProcessing import parseTimestamps, processChunk
+from lazyResources import get_database, get_model, get_tokenizer
+from sentimentInference import encode_pending_posts, analyze_with_cache
+from rollups import ROLLUP_COLLECTION_NAME, apply_rollups, ensure_rollup_index, rebuild_rollups
+from responseCache import mark_ingest_complete
+from ingestPipeline import run_pipeline
+from bulkWriter import add_post_keys, bulk_upsert, ensure_post_key_index, stored_versions
+from metrics import StageTimer
+from structuredLogging import get_logger
+
+# Long-running ingest: tails a JSONL spool, or a drop directory of .jsonl/.csv files, of raw posts in the
+# Kaggle format ({"id", "body", "timestamp"}) and takes each micro-batch through preprocessing, inference and
+# the MongoDB writes in one go. Run from pythonScripts/:  python streamingIngest.py --source incoming/
+logger = get_logger("streamingIngest")
+
+STREAM_SOURCE = os.getenv("STREAM_SOURCE", "incoming")
+
+# A micro-batch is sent on once it has STREAM_BATCH_SIZE posts, or STREAM_BATCH_SECONDS after its first post arrived
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+STREAM_BATCH_SECONDS = float(os.getenv("STREAM_BATCH_SECONDS", "5"))
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "1"))
+
+# Micro-batches waiting for inference, and scored batches waiting to be written; when both are full the source isn't read
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "2"))
+
+# Spool read position, saved once the posts before it are written, so a restart carries on from there
+STREAM_CHECKPOINT_FILE = os.getenv("STREAM_CHECKPOINT_FILE", "streamingIngest.checkpoint.json")
+
+# New posts are announced to the API (which drops its cached responses) at most once every STREAM_STATUS_SECONDS
+STREAM_STATUS_SECONDS = float(os.getenv("STREAM_STATUS_SECONDS", "60"))
+
+# Stage timings, counters and freshness, rewritten after every micro-batch
+STREAM_SUMMARY_FILE = os.getenv("STREAM_SUMMARY_FILE", "streamingIngest.summary.json")
+
+RAW_COLUMNS = ["id", "body", "timestamp"]
+SPOOL_READ_BYTES = 1 << 20
+FRESHNESS_WINDOW = 100_000  # Most recent posts the freshness percentiles are taken over
+
+class SpoolReader:
+    """Tails an append-only JSONL file, one raw post per line.
+
+    Only complete lines are read. Each post's token is the byte offset just
+    after its line, and acknowledge() saves the furthest written one, so a
+    restarted worker re-reads at most the posts that weren't written yet.
+    The spool is read from the start again if it is replaced or truncated.
+    """
+
+    def __init__(self, path, checkpoint_file):
+        self.path = path
+        self.checkpoint_file = checkpoint_file
+        self.offset = 0
+        self.inode = None
+        if os.path.exists(checkpoint_file):
+            with open(checkpoint_file, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved.get("spool") == os.path.abspath(path):
+                self.offset, self.inode = saved["offset"], saved["inode"]
+        self.read_offset = self.offset
+
+    def poll(self, limit):
+        """Up to limit new (record, seen_at, token) tuples; seen_at is when the line was read."""
+        if not os.path.exists(self.path):
+            return []
+        stat = os.stat(self.path)
+        if stat.st_ino != self.inode or stat.st_size < self.read_offset:
+            if self.inode is not None:
+                logger.warning("Spool was replaced, reading it from the start", extra={"fields": {"spool": self.path}})
+            self.inode, self.offset, self.read_offset = stat.st_ino, 0, 0
+        if stat.st_size == self.read_offset:
+            return []
+
+        with open(self.path, "rb") as file:
+            file.seek(self.read_offset)
+            data = file.read(SPOOL_READ_BYTES)
+        seen_at = time.time()
+        posts = []
+        for line in data.splitlines(keepends=True):
+            if len(posts) == limit or not line.endswith(b"\n"):
+                break  # The rest is read by the next poll; a line without a newline is still being written
+            self.read_offset += len(line)
+            if line.strip():
+                record = parse_record(line)
+                if record is not None:
+                    posts.append((record, seen_at, self.read_offset))
+        if len(data) == SPOOL_READ_BYTES and not posts and b"\n" not in data:
+            raise ValueError(f"Spool line longer than {SPOOL_READ_BYTES} bytes at offset {self.read_offset}")
+        return posts
+
+    def acknowledge(self, tokens):
+        self.offset = max(tokens, default=self.offset)
+        temp_path = f"{self.checkpoint_file}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"spool": os.path.abspath(self.path), "inode": self.inode, "offset": self.offset}, file)
+        os.replace(temp_path, self.checkpoint_file)
+
+class DropDirectoryReader:
+    """Reads .jsonl and .csv files dropped into a directory, oldest first.
+
+    Files should be written elsewhere (or under a name ending in .tmp) and
+    then renamed into the directory, so a half written file is never read.
+    A file is moved to done/ once all of its posts are written; files that
+    were still being read when the worker stopped are read again in full.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.done_directory = os.path.join(directory, "done")
+        os.makedirs(self.done_directory, exist_ok=True)
+        self.opened = set()
+        self.current = None  # (path, iterator of records with a lookahead, seen_at)
+
+    def next_file(self):
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.endswith((".jsonl", ".csv")) and os.path.join(self.directory, name) not in self.opened
+        ]
+        paths = [os.path.join(self.directory, name) for name in names]
+        paths = [path for path in paths if os.path.isfile(path)]
+        return min(paths, key=lambda path: (os.path.getmtime(path), path), default=None)
+
+    def poll(self, limit):
+        """Up to limit new (record, seen_at, token) tuples; seen_at is when the file was dropped."""
+        posts = []
+        while len(posts) < limit:
+            if self.current is None:
+                path = self.next_file()
+                if path is None:
+                    break
+                self.opened.add(path)
+                records = with_last(read_file(path))
+                first = next(records, None)
+                if first is None:
+                    self.finish(path)  # No posts, so nothing has to be written first
+                    continue
+                self.current = (path, itertools.chain([first], records), os.path.getmtime(path))
+            path, records, seen_at = self.current
+            for record, is_last in records:
+                posts.append((record, seen_at, (path, is_last)))
+                if is_last:
+                    self.current = None
+                if len(posts) == limit:
+                    break
+        return posts
+
+    def acknowledge(self, tokens):
+        for path, is_last in tokens:
+            if is_last:
+                self.finish(path)
+
+    def finish(self, path):
+        os.replace(path, os.path.join(self.done_directory, os.path.basename(path)))
+        self.opened.discard(path)
+
+def parse_record(line):
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        logger.warning("Skipping a line that isn't valid JSON", extra={"fields": {"line": line[:200]}})
+        return None
+    if not isinstance(record, dict) or record.get("id") is None:
+        logger.warning("Skipping a post without an id", extra={"fields": {"line": line[:200]}})
+        return None
+    return record
+
+def read_file(path):
+    if path.endswith(".csv"):
+        for chunk in pd.read_csv(path, encoding="utf-8", dtype={"id": str, "body": str}, chunksize=STREAM_BATCH_SIZE):
+            for record in chunk.to_dict("records"):
+                if pd.notna(record.get("id")):
+                    yield record
+    else:
+        with open(path, "rb") as file:
+            for line in file:
+                if line.strip():
+                    record = parse_record(line)
+                    if record is not None:
+                        yield record
+
+def with_last(iterable):
+    """Yields (item, is_last) pairs."""
+    iterator = iter(iterable)
+    previous = next(iterator, StopIteration)
+    while previous is not StopIteration:
+        item = next(iterator, StopIteration)
+        yield previous, item is StopIteration
+        previous = item
+
+def make_reader(source):
+    if os.path.isdir(source) or not os.path.splitext(source)[1]:
+        os.makedirs(source, exist_ok=True)
+        return DropDirectoryReader(source)
+    return SpoolReader(source, STREAM_CHECKPOINT_FILE)
+
+async def sleep_unless_stopped(stop, seconds):
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=max(seconds, 0))
+    except asyncio.TimeoutError:
+        pass
+
+async def batch_posts(reader, batches, stop):
+    """Reads the source into micro-batches of up to STREAM_BATCH_SIZE posts or STREAM_BATCH_SECONDS.
+
+    Waits on the bounded batches queue when inference is behind, which stops
+    the source being read. On stop, the partial batch is flushed and a None
+    marks the end of the stream.
+    """
+    batch = []
+    started = None
+    while True:
+        stopping = stop.is_set()
+        posts = []
+        if not stopping and len(batch) < STREAM_BATCH_SIZE:
+            posts = await asyncio.to_thread(reader.poll, STREAM_BATCH_SIZE - len(batch))
+            if posts and not batch:
+                started = time.monotonic()
+            batch.extend(posts)
+        due = batch and time.monotonic() - started >= STREAM_BATCH_SECONDS
+        if batch and (len(batch) >= STREAM_BATCH_SIZE or due or stopping):
+            await batches.put(batch)
+            batch = []
+        if stopping:
+            await batches.put(None)
+            return
+        if not posts:
+            wait = STREAM_POLL_SECONDS if not batch else min(STREAM_POLL_SECONDS, STREAM_BATCH_SECONDS - (time.monotonic() - started))
+            await sleep_unless_stopped(stop, wait)
+
+async def queued_batches(batches):
+    while (batch := await batches.get()) is not None:
+        yield batch
+
+def score_batch(batch, stages):
+    """Preprocesses, filters and scores one micro-batch, returning its documents. Blocking; runs in an executor."""
+    records, seen_at, tokens = zip(*batch)
+    raw = pd.DataFrame.from_records(list(records), columns=RAW_COLUMNS)
+    scored = {"rows": len(raw), "documents": [], "seenAt": [], "tokens": tokens}
+
+    # Boilerplate filters, preProcessText and symbol extraction, exactly as PreProcessing.py does them.
+    with stages.time("preprocess", len(raw)):
+        # processChunk drops them too; they are logged here, and acknowledged with the batch so a restart skips them.
+        bad_timestamps = parseTimestamps(raw["timestamp"]).isna()
+        for post_id, timestamp in zip(raw.loc[bad_timestamps, "id"], raw.loc[bad_timestamps, "timestamp"]):
+            logger.warning("Skipping a post with an unparseable timestamp", extra={"fields": {"id": post_id, "timestamp": str(timestamp)[:200]}})
+        processed = processChunk(raw[~bad_timestamps].copy())
+    if processed.empty:
+        return scored
+
+    tokenizer = get_tokenizer(MODEL_NAME)
+    posts = processed["post"].astype(str).tolist()
+    with stages.time("filter", len(posts)):
+        cached = sentiment_cache().get_many(dict.fromkeys(posts))
+        pending = encode_pending_posts(posts, tokenizer, cached)
+        valid = [post in cached or post in pending for post in posts]
+        processed = processed[valid]
+        posts = [post for post, keep in zip(posts, valid) if keep]
+    with stages.time("infer", len(posts)):
+        results = analyze_with_cache(
+            posts, cached, pending, sentiment_cache(), tokenizer, get_model(MODEL_NAME, INFERENCE_BACKEND), MAX_BATCH_SIZE, MAX_BATCH_TOKENS,
+        )
+    with stages.time("build", len(posts)):
+        processed = add_post_keys(processed.assign(date=processed["date"].astype(str), ticker=processed["symbols"]))
+        scored["documents"] = build_documents(processed, results)
+        scored["seenAt"] = [seen_at[i] for i in processed.index]
+    return scored
+
+def freshness_stats(freshness):
+    """Seconds from a post arriving to its document being written, over the most recent posts."""
+    if not freshness:
+        return {}
+    values = sorted(freshness)
+    return {
+        "posts": len(values),
+        "p50Seconds": round(values[len(values) // 2], 3),
+        "p95Seconds": round(values[min(len(values) - 1, int(0.95 * len(values)))], 3),
+        "maxSeconds": round(values[-1], 3),
+    }
+
+def previous_run_status():
+    """Status in the last worker's summary ("running" if it was killed), or None without one."""
+    try:
+        with open(STREAM_SUMMARY_FILE, "r", encoding="utf-8") as file:
+            return json.load(file)["counters"]["status"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+async def run_worker(source):
+    stages = StageTimer()
+    counters = {"status": "running", "batches": 0, "rowsRead": 0, "written": 0, "upserted": 0}
+    freshness = deque(maxlen=FRESHNESS_WINDOW)
+
+    db = get_database(DB_NAME)
+    collection = db[COLLECTION_NAME]
+    rollup_collection = db[ROLLUP_COLLECTION_NAME]
+    await ensure_post_key_index(collection)
+    await ensure_rollup_index(rollup_collection)
+    if previous_run_status() not in (None, "stopped"):
+        # The last worker died or failed, possibly between writing a batch and adding it to the rollups.
+        logger.info("Rebuilding the daily rollups after an unclean stop")
+        await rebuild_rollups(collection, rollup_collection)
+    logger.info("Loading sentiment model", extra={"fields": {"model": MODEL_NAME, "backend": INFERENCE_BACKEND}})
+    await asyncio.to_thread(get_model, MODEL_NAME, INFERENCE_BACKEND)
+
+    reader = make_reader(source)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows event loops
+            signal.signal(signal_number, lambda *_: loop.call_soon_threadsafe(stop.set))
+
+    # Set once posts are written and cleared when the API is told, so its cache isn't dropped after every micro-batch.
+    unannounced = False
+
+    async def announce_new_posts():
+        nonlocal unannounced
+        while not stop.is_set():
+            await sleep_unless_stopped(stop, STREAM_STATUS_SECONDS)
+            if unannounced:
+                unannounced = False
+                try:
+                    await mark_ingest_complete(db)  # Tells the API its cached responses are stale
+                except Exception:
+                    logger.exception("Could not update the ingest status, retrying later")
+                    unannounced = True
+
+    async def write_batch(scored):
+        nonlocal unannounced
+        documents = scored["documents"]
+        if documents:
+            with stages.time("write", len(documents)):
+                previous = await stored_versions(collection, documents)
+                result = await bulk_upsert(collection, documents)
+            with stages.time("rollup", len(documents)):
+                await apply_rollups(rollup_collection, documents, previous)
+            unannounced = True
+            counters["upserted"] += result.upserted_count
+        # Only now is the source allowed to forget these posts.
+        await asyncio.to_thread(reader.acknowledge, scored["tokens"])
+
+        written_at = time.time()
+        batch_freshness = [written_at - seen_at for seen_at in scored["seenAt"]]
+        freshness.extend(batch_freshness)
+        counters["batches"] += 1
+        counters["rowsRead"] += scored["rows"]
+        counters["written"] += len(documents)
+        logger.info("Micro-batch written", extra={"fields": {
+            "rows": scored["rows"], "documents": len(documents), **freshness_stats(batch_freshness),
+        }})
+        stages.write_summary(STREAM_SUMMARY_FILE, **counters, freshness=freshness_stats(freshness))
+
+    logger.info("Streaming ingest started", extra={"fields": {"source": source, "batchSize": STREAM_BATCH_SIZE, "batchSeconds": STREAM_BATCH_SECONDS}})
+    batches = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    announcer = asyncio.create_task(announce_new_posts())
+    tasks = [
+        asyncio.create_task(batch_posts(reader, batches, stop)),
+        asyncio.create_task(run_pipeline(queued_batches(batches), lambda batch: score_batch(batch, stages), write_batch, STREAM_QUEUE_SIZE, 1)),
+    ]
+    try:
+        # The pipeline finishes once the flushed last batch is written; an error in either task stops both.
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        await asyncio.gather(*tasks)
+        counters["status"] = "stopped"
+    except Exception as e:
+        logger.exception("Streaming ingest failed")
+        counters.update(status="failed", error=str(e))
+        raise
+    finally:
+        for task in (*tasks, announcer):
+            task.cancel()
+        await asyncio.gather(*tasks, announcer, return_exceptions=True)
+        if unannounced:
+            await mark_ingest_complete(db)
+        summary = stages.write_summary(STREAM_SUMMARY_FILE, **counters, freshness=freshness_stats(freshness))
+        logger.info("Streaming ingest stopped", extra={"fields": {**summary["counters"], "elapsedSeconds": summary["elapsedSeconds"]}})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously ingest raw WSB posts from a JSONL spool or a drop directory.")
+    parser.add_argument("--source", default=STREAM_SOURCE, help="A .jsonl spool file to tail, or a directory to watch for .jsonl/.csv files.")
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.source))
@@ -0,0 +1,47 @@
+import os
+import json
+import logging
+
+# LOG_LEVEL picks the lowest level written (DEBUG shows per-request lines; WARNING or higher silences the API's info logs).
+# LOG_FORMAT=json writes one JSON object per line for log collectors; the default is plain text.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; values passed as extra={"fields": {...}} become top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Plain text, with any extra fields appended as key=value pairs."""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+def get_logger(name):
+    """Logger under the shared "wsb" logger, which is configured from the environment the first time."""
+    root = logging.getLogger("wsb")
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        if LOG_FORMAT == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return root.getChild(name)
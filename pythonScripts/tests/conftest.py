@@ -0,0 +1,34 @@
+# Tests run from pythonScripts/ (python -m pytest tests), where the scripts import each other as top-level modules.
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def tiny_model_dir(tmp_path_factory):
+    """The tiny offline model from the benchmarks, so model code runs without downloading FinBERT."""
+    from benchmarks.tinyModel import build_tiny_model
+    return build_tiny_model(str(tmp_path_factory.mktemp("tiny-model")))
+
+@pytest.fixture(scope="session")
+def tiny_tokenizer(tiny_model_dir):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(tiny_model_dir)
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    """An in-memory mongomock-motor database that takes the bulk writes the ingest scripts send."""
+    from mongomock.collection import BulkOperationBuilder
+    from mongomock_motor import AsyncMongoMockClient
+
+    # pymongo 4.11+ passes sort to every bulk ReplaceOne and UpdateOne, which mongomock's builder doesn't take yet.
+    def without_sort(add):
+        def add_without_sort(self, *args, sort=None, **kwargs):
+            assert sort is None
+            return add(self, *args, **kwargs)
+        return add_without_sort
+
+    monkeypatch.setattr(BulkOperationBuilder, "add_replace", without_sort(BulkOperationBuilder.add_replace))
+    monkeypatch.setattr(BulkOperationBuilder, "add_update", without_sort(BulkOperationBuilder.add_update))
+    return AsyncMongoMockClient()["test"]
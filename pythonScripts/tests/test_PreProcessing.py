@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+import textNormalizer
+from nearDuplicates import NearDuplicateIndex
+from PreProcessing import parseTimestamps, processChunk
+from processedPosts import postsToScore
+
+def test_timestamps_that_cant_be_parsed_become_nat():
+    timestamps = pd.Series(["2022-01-03 10:00:00", "not a time", None, "", 1e30, {"$date": 1}], dtype=object)
+    parsed = parseTimestamps(timestamps)
+    assert parsed.tolist()[0] == pd.Timestamp("2022-01-03 10:00:00")
+    assert parsed.iloc[1:].isna().all()
+
+def test_numeric_timestamps_are_seconds_since_the_epoch():
+    parsed = parseTimestamps(pd.Series([1641204000, "1641204000", 1641204000.5], dtype=object))
+    assert parsed.dt.date.tolist() == [pd.Timestamp("2022-01-03").date()] * 3
+    assert parsed.iloc[2] == pd.Timestamp("2022-01-03 10:00:00.5")
+
+def test_timestamps_in_other_formats_or_offsets_are_still_parsed():
+    parsed = parseTimestamps(pd.Series(["2022-01-03 10:00:00", "2022-01-04T09:30:00+02:00", "Jan 5 2022"], dtype=object))
+    assert parsed.tolist() == [pd.Timestamp("2022-01-03 10:00:00"), pd.Timestamp("2022-01-04 07:30:00"), pd.Timestamp("2022-01-05")]
+
+@pytest.fixture
+def nearDuplicatePosts(monkeypatch):
+    monkeypatch.setattr(textNormalizer, "getStopWords", lambda: frozenset(["the", "to", "and", "i", "am"]))
+    body = "GME to the moon and I am buying more calls on every single dip this week"
+    return pd.DataFrame({
+        "id": ["1", "2", "3"],
+        "timestamp": ["2022-01-03 10:00:00"] * 3,
+        "body": [body, body + " lol", "AMC earnings look terrible so I am buying puts before the report"],
+    })
+
+def test_near_duplicates_are_kept_with_their_representative(nearDuplicatePosts):
+    dedup = NearDuplicateIndex(0.7)
+    data = processChunk(nearDuplicatePosts, dedup)
+    assert data["id"].tolist() == ["1", "2", "3"]
+    assert data["representative"].notna().tolist() == [False, True, False]
+    assert postsToScore(data).tolist() == [data["post"].iloc[0]] * 2 + [data["post"].iloc[2]]
+    # Only fixed-size digests of the posts are remembered, not their text.
+    assert {len(key) for key in dedup.clusterOf} == {16}
+
+def test_near_duplicates_can_be_dropped(nearDuplicatePosts):
+    data = processChunk(nearDuplicatePosts, NearDuplicateIndex(0.7), dropDuplicates=True)
+    assert data["id"].tolist() == ["1", "3"]
@@ -0,0 +1,29 @@
+import asyncio
+import pandas as pd
+import pytest
+from pymongo.errors import BulkWriteError
+from bulkWriter import POST_KEY_FIELD, add_post_keys, ensure_post_key_index
+
+def test_posts_are_keyed_by_id_whatever_batch_they_arrive_in():
+    # mongoInsert2 keys the whole processed file; streamingIngest keys one micro-batch at a time.
+    whole = add_post_keys(pd.DataFrame({"id": ["a1", "a2", "a3"], "date": ["2022-01-03"] * 3, "body": ["x", "x", "y"]}))
+    streamed = [add_post_keys(pd.DataFrame({"id": [post_id], "date": ["2022-01-03"], "body": [body]}))
+                for post_id, body in [("a3", "y"), ("a2", "x"), ("a1", "x")]]
+    assert {key for batch in streamed for key in batch[POST_KEY_FIELD]} == set(whole[POST_KEY_FIELD])
+    assert whole[POST_KEY_FIELD].nunique() == 3
+
+def test_rows_without_an_id_fall_back_to_a_content_key():
+    legacy = add_post_keys(pd.DataFrame({"date": ["2022-01-03"] * 2, "body": ["x", "x"]}))
+    assert legacy[POST_KEY_FIELD].nunique() == 2
+    mixed = add_post_keys(pd.DataFrame({"id": [None, "a1"], "date": ["2022-01-03"] * 2, "body": ["x", "x"]}))
+    assert mixed[POST_KEY_FIELD].iloc[0] == legacy[POST_KEY_FIELD].iloc[0]
+    assert mixed[POST_KEY_FIELD].iloc[1] not in set(legacy[POST_KEY_FIELD])
+
+def test_post_key_index_leaves_unkeyed_documents_alone(mongo_db):
+    collection = mongo_db["postsV2"]
+    asyncio.run(ensure_post_key_index(collection))
+    asyncio.run(collection.insert_many([{"date": "2022-01-03", "sentiment": 1}, {"date": "2022-01-04", "sentiment": 0}]))
+    asyncio.run(collection.insert_many([{"date": "2022-01-05", "sentiment": -1}]))
+    with pytest.raises(BulkWriteError):
+        asyncio.run(collection.insert_many([{POST_KEY_FIELD: "a"}, {POST_KEY_FIELD: "a"}]))
+    assert asyncio.run(collection.count_documents({POST_KEY_FIELD: {"$exists": False}})) == 3
@@ -0,0 +1,11 @@
+from inferenceBackends import BACKENDS, results_model_name
+from sentimentCache import SentimentCache
+
+def test_each_backend_has_its_own_cache_entries(tmp_path):
+    names = {results_model_name("finbert", backend) for backend in BACKENDS}
+    assert len(names) == len(BACKENDS)
+
+    path = str(tmp_path / "cache.sqlite")
+    SentimentCache(results_model_name("finbert", "onnx-int8"), path).put_many([("gme to the moon", {"label": "positive", "confidence": 0.7})])
+    assert SentimentCache(results_model_name("finbert", "torch"), path).get_many(["gme to the moon"]) == {}
+    assert SentimentCache(results_model_name("finbert", "onnx-int8"), path).get_many(["gme to the moon"]) != {}
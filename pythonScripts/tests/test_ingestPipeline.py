@@ -0,0 +1,139 @@
+import asyncio
+import pandas as pd
+import pytest
+from bulkWriter import POST_KEY_FIELD, Checkpoint, add_post_keys, bulk_upsert, ensure_post_key_index
+from ingestPipeline import run_pipeline
+
+CHUNK_SIZE = 4
+
+def make_posts(count):
+    return add_post_keys(pd.DataFrame({
+        "id": [f"t{i}" for i in range(count)],
+        "date": [f"2022-01-{1 + i % 28:02d}" for i in range(count)],
+        "body": [f"GME post {i}" for i in range(count)],
+    }))
+
+def numbered_chunks(posts, start_row=0):
+    # Chunks are numbered from 0 on every run, as mongoInsert2 does after resuming.
+    remaining = posts.iloc[start_row:]
+    return enumerate(remaining.iloc[i:i + CHUNK_SIZE] for i in range(0, len(remaining), CHUNK_SIZE))
+
+async def ingest(collection, posts, checkpoint, start_row=0, block_chunk=None, blocked=None):
+    """Runs the pipeline the way mongoInsert2 does, with a stand-in for the model."""
+    counters = {"upserted": 0, "matched": 0}
+
+    def score_chunk(numbered_chunk):
+        chunk_id, chunk = numbered_chunk
+        checkpoint.register(chunk_id, int(chunk.index[-1]))
+        return chunk_id, [
+            {POST_KEY_FIELD: key, "date": date, "originalPost": body, "sentiment": len(body) % 3 - 1}
+            for key, date, body in zip(chunk[POST_KEY_FIELD], chunk["date"], chunk["body"])
+        ]
+
+    async def write_chunk(scored_chunk):
+        chunk_id, documents = scored_chunk
+        result = await bulk_upsert(collection, documents)
+        counters["upserted"] += result.upserted_count
+        counters["matched"] += result.matched_count
+        if chunk_id == block_chunk:
+            blocked.set()
+            await asyncio.Event().wait()  # Written but never acknowledged, like a run killed mid-chunk
+        checkpoint.acknowledge(chunk_id)
+
+    await run_pipeline(numbered_chunks(posts, start_row), score_chunk, write_chunk, queue_size=2, writer_tasks=2)
+    return counters
+
+def test_scoring_runs_ahead_of_a_slow_writer_up_to_the_queue_size():
+    queue_size = 2
+    scored, writes_started, written, buffered = [], [], [], []
+
+    def score_chunk(chunk_id):
+        # Scored chunks that no writer has taken yet, i.e. the ones waiting in the queue.
+        buffered.append(len(scored) - len(writes_started))
+        scored.append(chunk_id)
+        return chunk_id
+
+    async def run():
+        release = asyncio.Event()
+
+        async def write_chunk(chunk_id):
+            writes_started.append(chunk_id)
+            if chunk_id == 0:
+                await release.wait()
+            written.append(chunk_id)
+
+        pipeline = asyncio.create_task(run_pipeline(range(10), score_chunk, write_chunk, queue_size=queue_size, writer_tasks=1))
+
+        async def scoring_stalls():
+            while len(scored) < queue_size + 2:
+                await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(scoring_stalls(), timeout=10)
+        await asyncio.sleep(0.1)
+        # Chunk 1 was scored while write 0 was still pending...
+        assert writes_started == [0] and written == [] and 1 in scored
+        # ...but the producer stops once the queue is full: chunk 0 in the writer,
+        # queue_size chunks queued and one waiting for room.
+        assert len(scored) == queue_size + 2
+        release.set()
+        await pipeline
+
+    asyncio.run(run())
+
+    assert written == list(range(10))
+    assert max(buffered) <= queue_size
+
+@pytest.fixture
+def collection(mongo_db):
+    collection = mongo_db["postsV2"]
+    asyncio.run(ensure_post_key_index(collection))
+    return collection
+
+@pytest.fixture
+def source_file(tmp_path):
+    path = tmp_path / "processed.csv"
+    path.write_text("stand-in for the processed posts\n")
+    return str(path)
+
+def test_rerunning_an_ingest_upserts_nothing_new(collection, source_file, tmp_path):
+    posts = make_posts(10)
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+
+    first = asyncio.run(ingest(collection, posts, Checkpoint(checkpoint_file, source_file)))
+    second = asyncio.run(ingest(collection, posts, Checkpoint(checkpoint_file, source_file)))
+
+    assert first == {"upserted": 10, "matched": 0}
+    assert second == {"upserted": 0, "matched": 10}
+    assert asyncio.run(collection.count_documents({})) == 10
+
+def test_cancelled_ingest_resumes_from_its_checkpoint(collection, source_file, tmp_path):
+    posts = make_posts(18)
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+
+    async def cancelled_run():
+        blocked = asyncio.Event()
+        run = asyncio.create_task(ingest(collection, posts, Checkpoint(checkpoint_file, source_file), block_chunk=2, blocked=blocked))
+        await asyncio.wait_for(blocked.wait(), timeout=10)
+        await asyncio.sleep(0.05)  # Lets the other writer finish its chunk
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run
+
+    asyncio.run(cancelled_run())
+
+    # Chunk 2 was written but not acknowledged, so the checkpoint stops at the end of chunk 1
+    # even if chunk 3 was acknowledged by the other writer.
+    checkpoint = Checkpoint(checkpoint_file, source_file)
+    resume_row = checkpoint.last_row + 1
+    assert resume_row == 2 * CHUNK_SIZE
+    written_before = asyncio.run(collection.count_documents({}))
+    assert written_before > resume_row
+
+    resumed = asyncio.run(ingest(collection, posts, checkpoint, start_row=resume_row))
+
+    # Rows written before the cancel are matched again instead of being duplicated.
+    assert resumed["upserted"] == len(posts) - written_before
+    assert resumed["matched"] == written_before - resume_row
+    assert asyncio.run(collection.count_documents({})) == len(posts)
+    keys = asyncio.run(collection.distinct(POST_KEY_FIELD))
+    assert sorted(keys) == sorted(posts[POST_KEY_FIELD])
@@ -0,0 +1,108 @@
+import json
+import base64
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+import main
+
+@pytest.fixture
+def client():
+    db = AsyncMongoMockClient()["test"]
+    posts = [
+        {"ticker": ["GME"], "date": f"2022-01-{day:02d}", "sentiment": 1, "confidence": day / 10}
+        for day in range(1, 6)
+    ]
+    asyncio.run(db[main.COLLECTION_NAME].insert_many(posts))
+    main.response_cache.invalidate()
+    main.app.dependency_overrides[main.get_db] = lambda: db
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+def make_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+def test_cursor_pages_through_every_post(client):
+    page = client.get("/ticker/gme", params={"limit": 2}).json()
+    dates = [post["date"] for post in page["posts"]]
+    while page["next_cursor"]:
+        page = client.get("/ticker/gme", params={"limit": 2, "cursor": page["next_cursor"]}).json()
+        if isinstance(page["posts"], list):
+            dates += [post["date"] for post in page["posts"]]
+    assert dates == [f"2022-01-{day:02d}" for day in range(1, 6)]
+
+@pytest.mark.parametrize("position", [
+    {"date": {"$ne": None}, "_id": "000000000000000000000000"},
+    {"date": {"$regex": "^2022"}, "_id": "000000000000000000000000"},
+    {"date": "2022-01-01", "_id": {"$gt": ""}},
+    {"date": ["2022-01-01"], "_id": "000000000000000000000000"},
+    {"date": "not a date", "_id": "000000000000000000000000"},
+    {"date": "2022-01-01"},
+    ["2022-01-01", "000000000000000000000000"],
+])
+def test_cursor_rejects_operators_and_wrong_types(client, position):
+    response = client.get("/ticker/gme", params={"cursor": make_cursor(position)})
+    assert response.status_code == 400
+
+def test_confidence_cursor_must_be_a_number(client):
+    position = {"confidence": {"$gt": 0}, "_id": "000000000000000000000000"}
+    response = client.get("/posts", params={"tickers": "GME", "sort": "-confidence", "cursor": make_cursor(position)})
+    assert response.status_code == 400
+
+def test_cache_invalidate_is_disabled_without_an_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert client.post("/cache/invalidate").status_code == 404
+    assert client.post("/cache/invalidate", headers={"X-Admin-Token": ""}).status_code == 404
+
+def test_cache_invalidate_needs_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/cache/invalidate").status_code == 403
+    assert client.post("/cache/invalidate", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.post("/cache/invalidate", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.json()["invalidations"] >= 1
+
+def test_debug_queries_is_off_by_default(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(main, "DEBUG_QUERIES", False)
+    assert client.get("/debug/queries", headers={"X-Admin-Token": "s3cret"}).status_code == 404
+
+def test_debug_queries_needs_the_flag_and_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(main, "DEBUG_QUERIES", True)
+    assert client.get("/debug/queries").status_code == 403
+    assert client.get("/debug/queries", headers={"X-Admin-Token": "s3cret"}).status_code == 200
+
+@pytest.mark.parametrize("params", [{"start": "2022-1-1"}, {"end": "yesterday"}, {"start": "2022-01-011"}, {"end": "2022-01-01T00:00"}])
+def test_daily_rejects_malformed_dates(client, params):
+    assert client.get("/ticker/gme/daily", params=params).status_code == 422
+
+def test_daily_accepts_iso_dates(client):
+    response = client.get("/ticker/gme/daily", params={"start": "2022-01-01", "end": "2022-01-31"})
+    assert response.status_code == 200
+
+@pytest.fixture
+def mixed_client():
+    # Posts written by mongoInsert.py before it stored confidence, and a few without a date, next to complete ones.
+    db = AsyncMongoMockClient()["test"]
+    posts = [{"ticker": ["GME"], "date": f"2022-01-{day:02d}", "sentiment": 1} for day in range(1, 4)]
+    posts += [{"ticker": ["GME"], "date": f"2022-01-{day:02d}", "sentiment": 1, "confidence": day / 10} for day in range(4, 7)]
+    posts += [{"ticker": ["GME"], "sentiment": 0, "confidence": 0.5}, {"ticker": ["GME"], "sentiment": 0}]
+    asyncio.run(db[main.COLLECTION_NAME].insert_many(posts))
+    main.response_cache.invalidate()
+    main.app.dependency_overrides[main.get_db] = lambda: db
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+@pytest.mark.parametrize("sort", ["date", "-date", "confidence", "-confidence"])
+def test_cursor_pages_past_posts_missing_the_sort_field(mixed_client, sort):
+    params = {"tickers": "GME", "sort": sort}
+    expected = [post["_id"] for post in mixed_client.get("/posts", params=params).json()["posts"]]
+    page = mixed_client.get("/posts", params={**params, "limit": 2}).json()
+    ids = [post["_id"] for post in page["posts"]]
+    while page["next_cursor"]:
+        page = mixed_client.get("/posts", params={**params, "limit": 2, "cursor": page["next_cursor"]}).json()
+        if isinstance(page["posts"], list):
+            ids += [post["_id"] for post in page["posts"]]
+    assert len(expected) == 8
+    assert ids == expected
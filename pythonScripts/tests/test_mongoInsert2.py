@@ -0,0 +1,71 @@
+import asyncio
+import datetime
+import pandas as pd
+import pytest
+import mongoInsert2
+import sentimentInference
+from processedPosts import openWriter
+
+CHUNK_SIZE = 4
+
+@pytest.fixture
+def ingest(tiny_model_dir, mongo_db, tmp_path, monkeypatch):
+    """Runs mongoInsert2 over the given processed posts with the tiny model and the in-memory database."""
+    def run(posts):
+        processed_file = str(tmp_path / "posts.parquet")
+        with openWriter(processed_file) as writer:
+            writer.write(posts)
+        monkeypatch.setattr(mongoInsert2, "PROCESSED_FILE", processed_file)
+        asyncio.run(mongoInsert2.process_posts())
+        return asyncio.run(mongo_db[mongoInsert2.COLLECTION_NAME].find({}, {"_id": 0}).to_list(length=None))
+
+    monkeypatch.setattr(mongoInsert2, "MODEL_NAME", tiny_model_dir)
+    monkeypatch.setattr(mongoInsert2, "INFERENCE_CHUNK_SIZE", CHUNK_SIZE)
+    monkeypatch.setattr(mongoInsert2, "SENTIMENT_CACHE_FILE", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(mongoInsert2, "CHECKPOINT_FILE", str(tmp_path / "checkpoint.json"))
+    monkeypatch.setattr(mongoInsert2, "INGEST_SUMMARY_FILE", str(tmp_path / "summary.json"))
+    monkeypatch.setattr(mongoInsert2, "get_database", lambda name: mongo_db)
+    return run
+
+def make_posts(texts):
+    return pd.DataFrame({
+        "id": [f"p{i}" for i in range(len(texts))],
+        "date": [datetime.date(2022, 1, 3)] * len(texts),
+        "body": texts,
+        "post": texts,
+        "symbols": [["GME"]] * len(texts),
+        "representative": [None] * len(texts),
+    })
+
+def test_posts_are_encoded_one_chunk_at_a_time(ingest, monkeypatch):
+    encoded = []
+    encode_pending_posts = sentimentInference.encode_pending_posts
+
+    def recording_encode(posts, tokenizer, cached):
+        pending = encode_pending_posts(posts, tokenizer, cached)
+        encoded.append(len(pending))
+        return pending
+
+    monkeypatch.setattr(mongoInsert2, "encode_pending_posts", recording_encode)
+    long_post = " ".join(f"word{i}" for i in range(700))
+    texts = [f"gme post number {i}" for i in range(10)]
+    texts[5] = long_post
+
+    documents = ingest(make_posts(texts))
+
+    assert len(encoded) == 3 and max(encoded) <= CHUNK_SIZE
+    assert sorted(document["originalPost"] for document in documents) == sorted(text for text in texts if text != long_post)
+
+def test_worker_processes_tokenize_posts_instead_of_the_parent(ingest, monkeypatch):
+    def parent_encode(posts, tokenizer, cached):
+        raise AssertionError("posts were tokenized in the parent process")
+
+    monkeypatch.setattr(mongoInsert2, "encode_pending_posts", parent_encode)
+    monkeypatch.setattr(mongoInsert2, "INFERENCE_WORKERS", 1)
+    long_post = " ".join(f"word{i}" for i in range(700))
+    texts = [f"gme post number {i % 6}" for i in range(10)]
+    texts[5] = long_post
+
+    documents = ingest(make_posts(texts))
+
+    assert sorted(document["originalPost"] for document in documents) == sorted(text for text in texts if text != long_post)
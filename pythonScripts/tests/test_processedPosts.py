@@ -0,0 +1,78 @@
+import os
+import datetime
+import pandas as pd
+import pyarrow.parquet as pq
+from processedPosts import ParquetPostsWriter, columns, openWriter, outputPosition, parquetParts, parquetSchema, readProcessed
+
+def make_posts(start, count):
+    return pd.DataFrame({
+        "id": [f"p{i}" for i in range(start, start + count)],
+        "date": [datetime.date(2022, 1, 1 + i % 28) for i in range(start, start + count)],
+        "body": [f"GME post {i}" for i in range(start, start + count)],
+        "post": [f"gme post {i}" for i in range(start, start + count)],
+        "symbols": [["GME"] for _ in range(count)],
+        "representative": [None] * count,
+    })
+
+def test_appending_adds_a_part_without_rewriting_earlier_ones(tmp_path):
+    path = str(tmp_path / "posts.parquet")
+    with openWriter(path) as writer:
+        writer.write(make_posts(0, 5))
+    first_part = parquetParts(path)[0]
+    first_stat = os.stat(first_part)
+
+    with openWriter(path, outputPosition(path)) as writer:
+        writer.write(make_posts(5, 3))
+
+    assert len(parquetParts(path)) == 2
+    assert os.stat(first_part).st_ino == first_stat.st_ino and os.stat(first_part).st_mtime_ns == first_stat.st_mtime_ns
+    assert outputPosition(path) == {"outputParts": 2, "outputRows": 8}
+    data = readProcessed(path)
+    assert data["body"].tolist() == [f"GME post {i}" for i in range(8)]
+    assert data.loc[7, "symbols"] == ["GME"] and data.loc[0, "date"] == "2022-01-01"
+    assert readProcessed(path, columns=["body"], startRow=6)["body"].tolist() == ["GME post 6", "GME post 7"]
+
+def test_parts_after_the_kept_position_are_dropped(tmp_path):
+    path = str(tmp_path / "posts.parquet")
+    with openWriter(path) as writer:
+        writer.write(make_posts(0, 5))
+    kept = outputPosition(path)
+    with openWriter(path, kept) as writer:  # A run that finished but never saved its watermark
+        writer.write(make_posts(100, 4))
+
+    with openWriter(path, kept) as writer:
+        writer.write(make_posts(5, 2))
+    assert readProcessed(path)["body"].tolist() == [f"GME post {i}" for i in range(7)]
+
+def test_empty_append_and_failed_writes_leave_the_output_alone(tmp_path):
+    path = str(tmp_path / "posts.parquet")
+    with openWriter(path) as writer:
+        writer.write(make_posts(0, 5))
+    with openWriter(path, outputPosition(path)):
+        pass
+    try:
+        with openWriter(path, outputPosition(path)) as writer:
+            writer.write(make_posts(5, 2))
+            raise RuntimeError("interrupted")
+    except RuntimeError:
+        pass
+    assert os.listdir(path) == ["part-00000.parquet"]
+    assert outputPosition(path) == {"outputParts": 1, "outputRows": 5}
+
+def test_full_write_replaces_a_single_file_output(tmp_path):
+    path = str(tmp_path / "posts.parquet")
+    pq.write_table(parquetSchema().empty_table(), path)  # Outputs written before they were split into parts
+    assert readProcessed(path).empty
+    with openWriter(path) as writer:
+        writer.write(make_posts(0, 3))
+    assert os.path.isdir(path) and not os.path.exists(f"{path}.old")
+    assert list(readProcessed(path).columns) == columns and len(readProcessed(path)) == 3
+
+def test_row_groups_stay_full_within_a_part(tmp_path):
+    path = str(tmp_path / "posts.parquet")
+    writer = ParquetPostsWriter(path, rowGroupSize=4)
+    for start in range(0, 10, 3):
+        writer.write(make_posts(start, 3))
+    writer.close()
+    metadata = pq.ParquetFile(parquetParts(path)[0]).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [4, 4, 4]
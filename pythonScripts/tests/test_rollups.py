@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from bulkWriter import POST_KEY_FIELD, bulk_upsert, ensure_post_key_index, stored_versions
+from rollups import apply_rollups, ensure_rollup_index, rollup_changes
+
+def post(key, sentiment, confidence, tickers=("GME",), date="2022-01-03"):
+    return {POST_KEY_FIELD: key, "ticker": list(tickers), "date": date, "sentiment": sentiment, "confidence": confidence}
+
+async def write(db, documents):
+    """Writes posts and their rollups the way mongoInsert2 and streamingIngest do."""
+    previous = await stored_versions(db["postsV2"], documents)
+    await bulk_upsert(db["postsV2"], documents)
+    await apply_rollups(db["rollups"], documents, previous)
+
+async def rollups(db):
+    return {(day["ticker"], day["date"]): (day["count"], day["sentimentSum"], pytest.approx(day["confidenceSum"]))
+            async for day in db["rollups"].find()}
+
+@pytest.fixture
+def db(mongo_db):
+    asyncio.run(ensure_post_key_index(mongo_db["postsV2"]))
+    asyncio.run(ensure_rollup_index(mongo_db["rollups"]))
+    return mongo_db
+
+def test_writing_the_same_posts_again_leaves_the_rollups_unchanged(db):
+    documents = [post("a", 1, 0.9, ("GME", "AMC")), post("b", -1, 0.6)]
+    asyncio.run(write(db, documents))
+    first = asyncio.run(rollups(db))
+    asyncio.run(write(db, documents))
+    assert asyncio.run(rollups(db)) == first == {("GME", "2022-01-03"): (2, 0, 1.5), ("AMC", "2022-01-03"): (1, 1, 0.9)}
+
+def test_rescored_posts_replace_their_old_scores_in_the_rollups(db):
+    asyncio.run(write(db, [post("a", 1, 0.9), post("b", -1, 0.6)]))
+    # Scored again by another backend, e.g. after switching INFERENCE_BACKEND.
+    asyncio.run(write(db, [post("a", -1, 0.7), post("b", -1, 0.5), post("c", 0, 0.8)]))
+    assert asyncio.run(rollups(db)) == {("GME", "2022-01-03"): (3, -2, 2.0)}
+
+def test_a_post_moved_to_another_ticker_leaves_its_old_rollup():
+    changes = rollup_changes([post("a", 1, 0.9, ("AMC",))], [post("a", 1, 0.9, ("GME",))])
+    assert changes == {("AMC", "2022-01-03"): {"count": 1, "sentimentSum": 1, "confidenceSum": 0.9},
+                       ("GME", "2022-01-03"): {"count": -1, "sentimentSum": -1, "confidenceSum": -0.9}}
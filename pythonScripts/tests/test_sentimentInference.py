@@ -0,0 +1,24 @@
+from sentimentCache import SentimentCache
+from sentimentInference import encode_posts, encode_pending_posts, analyze_with_cache
+
+POSTS = ["gme to the moon", "amc calls printing", "gme to the moon"]
+
+def test_encode_posts_empty_batch(tiny_tokenizer):
+    assert encode_posts([], tiny_tokenizer) == []
+
+def test_fully_cached_chunk_skips_the_model(tiny_tokenizer, tmp_path):
+    cache = SentimentCache("test-model", str(tmp_path / "cache.sqlite"))
+    results = {"gme to the moon": {"label": "positive", "confidence": 0.9}, "amc calls printing": {"label": "neutral", "confidence": 0.6}}
+    cache.put_many(results.items())
+
+    cached = cache.get_many(dict.fromkeys(POSTS))
+    pending = encode_pending_posts(POSTS, tiny_tokenizer, cached)
+    assert pending == {}
+
+    class NoModel:
+        def __call__(self, **inputs):
+            raise AssertionError("a fully cached chunk must not reach the model")
+
+    scored = analyze_with_cache(POSTS, cached, pending, cache, tiny_tokenizer, NoModel())
+    assert scored == [results[post] for post in POSTS]
+    assert cache.stats()["hits"] == 2  # Distinct posts
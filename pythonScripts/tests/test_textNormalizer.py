@@ -0,0 +1,62 @@
+import random
+import re
+import string
+import contractions
+import textNormalizer
+
+# Stop word removal is the same in both versions, so a fixed list keeps the test off the NLTK corpus.
+STOP_WORDS = frozenset(["i", "me", "the", "a", "is", "it", "to", "and", "not", "will", "would", "have", "are", "you", "all"])
+
+# PreProcessing.preProcessText as it was before textNormalizer.py, which the normalized posts have to keep matching.
+urlRegex = re.compile(r"https?://\S+")
+imgemoteRegex = re.compile(r"imgemotet\w*\d*")
+
+def removeNonASCII(text):
+    return ''.join(char for char in text if ord(char) < 128)
+
+def originalPreProcessText(s):
+    s = s.lower()
+    s = contractions.fix(s)
+    s = urlRegex.sub("", s)
+    s = removeNonASCII(s)
+    s = "".join(char for char in s if char not in string.punctuation)
+    s = " ".join(word for word in s.split() if word not in STOP_WORDS)
+    s = imgemoteRegex.sub("", s)
+    return s
+
+def contractionKeys():
+    keys = set(contractions.contractions_dict) | set(contractions.leftovers_dict) | set(contractions.slang_dict)
+    return sorted(keys | {key.replace("'", "’") for key in keys})
+
+def corpus():
+    keys = contractionKeys()
+    posts = [
+        "I can't believe GME is mooning, y'all shouldn't've sold https://reddit.com/r/wsb 🚀🚀",
+        "ain't nobody got time 4 that, i'd've bought more if i'd known",
+        "Y'ALL'D'VE HELD IF YOU COULD'VE imgemotet5x2 lol",
+        "it's o'clock somewhere... we're gonna make it ’cause we can’t lose",
+        "",
+    ]
+    for key in keys:
+        posts += [
+            key,
+            key.upper(),
+            key.title(),
+            f"well {key} and then some",
+            f"({key}), {key}!{key}?",
+            f"x{key} {key}y 1{key}_",
+        ]
+    # Random runs of keys and words, so overlapping and adjacent matches are covered as well.
+    rng = random.Random(0)
+    words = keys + ["gme", "tsla", "calls", "puts", "moon", "'", "s", "ve", "d"]
+    separators = [" ", "", "'", ", ", "-", "\n"]
+    for _ in range(3000):
+        posts.append("".join(rng.choice(words) + rng.choice(separators) for _ in range(rng.randint(1, 8))))
+    return posts
+
+def test_preprocessing_matches_the_original_on_every_contraction(monkeypatch):
+    monkeypatch.setattr(textNormalizer, "getStopWords", lambda: STOP_WORDS)
+
+    mismatches = [post for post in corpus() if textNormalizer.preProcessText(post) != originalPreProcessText(post)]
+
+    assert mismatches == []
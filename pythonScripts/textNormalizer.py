@@ -0,0 +1,86 @@
+import re
+import string
+from functools import lru_cache
+import ahocorasick
+import contractions
+import pandas as pd
+
+# Compiles the regex used while normalizing posts.
+urlRegex = re.compile(r"https?://\S+")
+imgemoteRegex = re.compile(r"imgemotet\w*\d*")
+
+# Creates our stopwords library the first time it is needed (importing nltk and reading the corpus is slow).
+@lru_cache(maxsize=None)
+def getStopWords():
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words("english"))
+
+# Translation table that deletes every punctuation character in a single str.translate call.
+punctuationTable = str.maketrans("", "", string.punctuation)
+
+# Characters that stop a contraction from matching inside a longer word (same bounds textsearch uses).
+wordChars = frozenset(string.ascii_letters + string.digits + "_")
+
+# Builds the contraction automaton once from the same table contractions.fix uses.
+# Posts are already lowercase when they get here, so the replacements are lowercased up front.
+def buildContractionAutomaton():
+    automaton = ahocorasick.Automaton()
+    for key, (length, replacement) in contractions.ts_leftovers_slang.automaton.items():
+        automaton.add_word(key, (length, replacement.lower()))
+    automaton.make_automaton()
+    return automaton
+
+contractionAutomaton = buildContractionAutomaton()
+
+# Expands contractions in an already lowercased post.
+# Mirrors the match selection of contractions.fix so the output is identical, without its per-match overhead.
+def expandContractions(s):
+    matches = []
+    currentStop = -1
+    textLength = len(s)
+    for endIndex, (length, replacement) in contractionAutomaton.iter(s):
+        start = endIndex - length + 1
+        stop = endIndex + 1
+        if stop != textLength and s[stop] in wordChars:
+            continue
+        if start != 0 and s[start - 1] in wordChars:
+            continue
+        if start >= currentStop:
+            currentStop = stop
+            matches.append((stop - start, start, stop, replacement))
+        elif stop - start > matches[-1][0]:
+            currentStop = max(currentStop, stop)
+            matches[-1] = (currentStop - start, start, currentStop, replacement)
+
+    if not matches:
+        return s
+
+    pieces = []
+    previousStop = 0
+    for _, start, stop, replacement in matches:
+        pieces.append(s[previousStop:start])
+        pieces.append(replacement)
+        previousStop = stop
+    pieces.append(s[previousStop:])
+    return "".join(pieces)
+
+# Function to complete preprocessing on the text.
+def preProcessText(s):
+    s = s.lower() # Make post lowercase
+    s = expandContractions(s) # Fix contractions within the post
+    s = urlRegex.sub("", s) # Remove url's from the posts
+    s = s.encode("ascii", "ignore").decode("ascii") # Remove all non ASCII chracters from posts (emojis)
+    s = s.translate(punctuationTable) # Remove punctuation from the posts
+    stopWords = getStopWords()
+    s = " ".join([word for word in s.split() if word not in stopWords]) # Removes stop words
+    s = imgemoteRegex.sub("", s)
+
+    return s # Returns the processed post.
+
+# Normalizes a whole Series (or chunk) of posts at once.
+# Each distinct post is only processed once, which matters on WSB where reposts are common.
+def normalizePosts(posts):
+    posts = posts.astype(str)
+    uniquePosts = pd.unique(posts)
+    normalized = dict(zip(uniquePosts, map(preProcessText, uniquePosts)))
+    return posts.map(normalized)
@@ -0,0 +1,78 @@
+import os
+import re
+import pickle
+from bisect import bisect_right
+import ahocorasick
+import pandas as pd
+
+# Only symbols that look like a ticker in a post (2-5 capital letters) can ever be matched.
+tickerFormat = re.compile(r"[A-Z]{2,5}")
+
+# Separator used when a batch of posts is scanned as one string (must not be a word character).
+postSeparator = "\n"
+
+# Function that checks if a character counts as part of a word (same as \w in re).
+def isWordChar(char):
+    return char.isalnum() or char == "_"
+
+# Builds the ticker automaton from an iterable of symbols.
+def buildTickerIndex(symbols):
+    index = ahocorasick.Automaton()
+    for symbol in symbols:
+        symbol = str(symbol).upper()
+        if tickerFormat.fullmatch(symbol):
+            index.add_word(symbol, symbol)
+    index.make_automaton()
+    return index
+
+# Saves a built index so later runs can skip reading the CSV.
+def saveTickerIndex(index, indexFile):
+    index.save(indexFile, pickle.dumps)
+
+# Loads the ticker index for a CSV, reusing the saved index unless the CSV is newer than it.
+def loadTickerIndex(csvFile, column, indexFile=None):
+    if indexFile and os.path.exists(indexFile) and os.path.getmtime(indexFile) >= os.path.getmtime(csvFile):
+        return ahocorasick.load(indexFile, pickle.loads)
+
+    symbolsCSV = pd.read_csv(csvFile, encoding="utf-8", usecols=[column])
+    index = buildTickerIndex(symbolsCSV[column].dropna())
+    if indexFile:
+        saveTickerIndex(index, indexFile)
+    return index
+
+# Finds every whole-word ticker in an upper-cased string, returning (start, ticker) pairs.
+def scanTickers(index, text):
+    textLength = len(text)
+    for endIndex, ticker in index.iter(text):
+        start = endIndex - len(ticker) + 1
+        stop = endIndex + 1
+        if stop != textLength and isWordChar(text[stop]):
+            continue
+        if start != 0 and isWordChar(text[start - 1]):
+            continue
+        yield start, ticker
+
+# Extracts the unique tickers mentioned in a single post.
+def extractTickers(index, post):
+    if not isinstance(post, str):
+        return []
+    return list(dict.fromkeys(ticker for _, ticker in scanTickers(index, post.upper())))
+
+# Extracts the tickers for a whole batch of posts with a single scan over the joined text.
+def extractTickersBatch(index, posts):
+    posts = [post if isinstance(post, str) else "" for post in posts]
+    starts = []
+    offset = 0
+    for post in posts:
+        starts.append(offset)
+        offset += len(post) + len(postSeparator)
+
+    found = [dict() for _ in posts]
+    text = postSeparator.join(posts).upper()
+    if len(text) != offset - len(postSeparator) and posts:
+        # Upper-casing changed the length (e.g. "ß" -> "SS"), so offsets no longer line up.
+        return [extractTickers(index, post) for post in posts]
+
+    for start, ticker in scanTickers(index, text):
+        found[bisect_right(starts, start) - 1][ticker] = None
+    return [list(tickers) for tickers in found]
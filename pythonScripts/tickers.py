@@ -1,37 +1,104 @@
-import pandas as pd
 import json
+import asyncio
+import argparse
+from collections import Counter
+import pandas as pd
 
-# Load the JSON file
+# The export is the posts collection, so the same results can be computed in MongoDB directly.
 file_path = "sentiment-analysis.posts.json"
-with open(file_path, "r", encoding="utf-8") as file:
-    data = json.load(file)
+DB_NAME = "sentiment-analysis"
+COLLECTION_NAME = "posts"
+output_file = "unique_tickers.csv"
+ts_output_file = "unique_tickers.ts"
 
-df = pd.DataFrame(data)
+# Yields the documents of the export one at a time, so only one read buffer is held in memory.
+# Works for both a JSON array export and an export with one document per line.
+def iter_export_documents(path, read_size=1 << 20):
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8-sig") as file:
+        buffer = ""
+        position = 0
+        while True:
+            # Skips the array brackets, commas and whitespace between documents.
+            while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                position += 1
+            if position == len(buffer):
+                buffer = file.read(read_size)
+                position = 0
+                if not buffer:
+                    return
+                continue
+            try:
+                document, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The document runs past the end of the buffer, so read more of it and try again.
+                more = file.read(read_size)
+                if not more:
+                    raise
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+            yield document
 
-# Extract unique tickers
-def extract_unique_tickers(df):
-    unique_tickers = set()
-    
-    for tickers in df['ticker'].dropna():  # Drop missing values
+# Counts the posts mentioning each ticker, keeping only the running counts.
+def count_tickers(documents):
+    counts = Counter()
+    for document in documents:
+        tickers = document.get("ticker")
+        if tickers is None:  # Skips posts without tickers
+            continue
         if isinstance(tickers, list):  # Ensure it's a list
-            unique_tickers.update(tickers)
+            counts.update(set(tickers))
         else:
             print(f"Skipping invalid entry: {tickers}")
-    
-    return sorted(unique_tickers)
+    return counts
 
-unique_tickers = extract_unique_tickers(df)
+# Computes the same counts with an aggregation in MongoDB, so no export is needed.
+async def count_tickers_in_mongo(db_name=DB_NAME, collection_name=COLLECTION_NAME):
+    from dotenv import load_dotenv
+    from lazyResources import get_database
+    load_dotenv()
+    collection = get_database(db_name)[collection_name]
+    pipeline = [
+        {"$match": {"ticker": {"$type": "array"}}},
+        {"$project": {"_id": 0, "ticker": {"$setUnion": ["$ticker", []]}}},  # Counts each post once per ticker
+        {"$unwind": "$ticker"},
+        {"$group": {"_id": "$ticker", "posts": {"$sum": 1}}},
+    ]
+    counts = Counter()
+    async for row in collection.aggregate(pipeline, allowDiskUse=True):
+        counts[row["_id"]] = row["posts"]
+    return counts
 
-# Save the unique tickers to a new CSV file
-output_file = "unique_tickers.csv"
-pd.DataFrame(unique_tickers, columns=["Ticker"]).to_csv(output_file, index=False)
+# Saves the unique tickers to a CSV file and as a TypeScript array, plus the per-ticker counts if asked.
+def save_tickers(counts, csv_file=output_file, ts_file=ts_output_file, counts_file=None):
+    unique_tickers = sorted(counts)
 
-print(f"Unique tickers saved to {output_file}")
+    pd.DataFrame(unique_tickers, columns=["Ticker"]).to_csv(csv_file, index=False)
+    print(f"Unique tickers saved to {csv_file}")
 
-# Save as TypeScript array
-typescript_output = f"var stocks: any[] = {unique_tickers};"
-ts_output_file = "unique_tickers.ts"
-with open(ts_output_file, "w", encoding="utf-8") as ts_file:
-    ts_file.write(typescript_output)
+    typescript_output = f"var stocks: any[] = {unique_tickers};"
+    with open(ts_file, "w", encoding="utf-8") as file:
+        file.write(typescript_output)
+    print(f"TypeScript array saved to {ts_file}")
+
+    if counts_file:
+        pd.DataFrame(counts.most_common(), columns=["Ticker", "Posts"]).to_csv(counts_file, index=False)
+        print(f"Per-ticker post counts saved to {counts_file}")
+    return unique_tickers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect the unique tickers mentioned in the sentiment-analysis posts.")
+    parser.add_argument("--source", choices=["export", "mongo"], default="export",
+                        help=f"Stream {file_path}, or aggregate {DB_NAME}.{COLLECTION_NAME} in MongoDB.")
+    parser.add_argument("--input", default=file_path, help="Export file to stream in export mode.")
+    parser.add_argument("--counts-file", help="Also save the number of posts mentioning each ticker to this CSV.")
+    args = parser.parse_args()
+
+    if args.source == "mongo":
+        counts = asyncio.run(count_tickers_in_mongo())
+    else:
+        counts = count_tickers(iter_export_documents(args.input))
 
-print(f"TypeScript array saved to {ts_output_file}")
+    save_tickers(counts, counts_file=args.counts_file)
+    print(f"{len(counts)} unique tickers; most mentioned: {counts.most_common(10)}")